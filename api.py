@@ -3,27 +3,30 @@ import asyncio
 import json
 import logging
 from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Any
 
 import aiohttp
 from tenacity import before_sleep_log, retry, retry_if_exception_type, wait_fixed
 
 from botli_dataclasses import API_Challenge_Reponse, Challenge_Request
+from circuit_breaker import circuit_breaker
 from config import Config
-from enums import Decline_Reason, Variant
+from connection_pool import WARM_UP_INTERVAL, Connection_Stats, create_connector
+from enums import Decline_Reason, Request_Class, Variant
+from ndjson_decoder import decode_line
+from request_scheduler import MAX_ACTIVE_REQUESTS, Request_Scheduler
 
 logger = logging.getLogger(__name__)
+CHESSDB_URL = 'http://www.chessdb.cn'
+EXPLORER_URL = 'https://explorer.lichess.ovh'
+TABLEBASE_URL = 'https://tablebase.lichess.ovh'
 BASIC_RETRY_CONDITIONS = {'retry': retry_if_exception_type((aiohttp.ClientError, TimeoutError)),
                           'wait': wait_fixed(5.0),
                           'before_sleep': before_sleep_log(logger, logging.DEBUG)}
 JSON_RETRY_CONDITIONS = {'retry': retry_if_exception_type((aiohttp.ClientError, json.JSONDecodeError, TimeoutError)),
                          'wait': wait_fixed(5.0),
                          'before_sleep': before_sleep_log(logger, logging.DEBUG)}
-GAME_STREAM_RETRY_CONDITIONS = {'retry': retry_if_exception_type((aiohttp.ClientError,
-                                                                  json.JSONDecodeError,
-                                                                  TimeoutError)),
-                                'wait': wait_fixed(1.0),
-                                'before_sleep': before_sleep_log(logger, logging.DEBUG)}
 MOVE_RETRY_CONDITIONS = {'retry': retry_if_exception_type((aiohttp.ClientError, TimeoutError)),
                          'wait': wait_fixed(1.0),
                          'before_sleep': before_sleep_log(logger, logging.DEBUG)}
@@ -44,19 +47,34 @@ class API:
             'User-Agent': f'BotLi/{config.version}'
         }
 
+        # Every game holds a stream and sends moves, next to the event stream and the scheduled requests.
+        self.lichess_stats = Connection_Stats()
         self.lichess_session = aiohttp.ClientSession(
             config.url,
+            connector=create_connector(2 * config.challenge.concurrency + MAX_ACTIVE_REQUESTS + 1),
             headers=headers,
-            timeout=aiohttp.ClientTimeout(total=5.0)
+            timeout=aiohttp.ClientTimeout(total=5.0),
+            trace_configs=[self.lichess_stats.trace_config]
         )
+        self.external_stats = Connection_Stats()
         self.external_session = aiohttp.ClientSession(
-            headers={'User-Agent': f'BotLi/{config.version}'}
+            connector=create_connector(2 * config.challenge.concurrency),
+            headers={'User-Agent': f'BotLi/{config.version}'},
+            trace_configs=[self.external_stats.trace_config]
         )
+        self.external_urls = [url for url, enabled
+                              in [(EXPLORER_URL, config.online_moves.opening_explorer.enabled),
+                                  (CHESSDB_URL, config.online_moves.chessdb.enabled),
+                                  (TABLEBASE_URL, config.online_moves.online_egtb.enabled)]
+                              if enabled]
+        self.request_scheduler = Request_Scheduler()
+        self.keep_warm_task: asyncio.Task[None] | None = None
 
     # --- остальной код без изменений ---
     # просто вставь сюда всё, что было в твоём классе API после __init__
 
     async def __aenter__(self) -> 'API':
+        self.keep_warm_task = asyncio.create_task(self._keep_warm())
         return self
 
     async def __aexit__(self, *_) -> None:
@@ -67,13 +85,16 @@ class API:
         self.external_session.headers['User-Agent'] += f' user:{username}'
 
     async def close(self) -> None:
+        if self.keep_warm_task:
+            self.keep_warm_task.cancel()
+
         await self.lichess_session.close()
         await self.external_session.close()
 
     @retry(**BASIC_RETRY_CONDITIONS)
     async def abort_game(self, game_id: str) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/bot/game/{game_id}/abort') as response:
+            async with self._post(Request_Class.GAME, f'/api/bot/game/{game_id}/abort') as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -83,7 +104,7 @@ class API:
     @retry(**BASIC_RETRY_CONDITIONS)
     async def accept_challenge(self, challenge_id: str) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/challenge/{challenge_id}/accept') as response:
+            async with self._post(Request_Class.CHALLENGE, f'/api/challenge/{challenge_id}/accept') as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -94,7 +115,7 @@ class API:
     @retry(**BASIC_RETRY_CONDITIONS)
     async def cancel_challenge(self, challenge_id: str) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/challenge/{challenge_id}/cancel') as response:
+            async with self._post(Request_Class.CHALLENGE, f'/api/challenge/{challenge_id}/cancel') as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -104,7 +125,7 @@ class API:
     @retry(**BASIC_RETRY_CONDITIONS)
     async def claim_victory(self, game_id: str) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/bot/game/{game_id}/claim-victory') as response:
+            async with self._post(Request_Class.GAME, f'/api/bot/game/{game_id}/claim-victory') as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -114,6 +135,7 @@ class API:
     async def create_challenge(self,
                                challenge_request: Challenge_Request
                                ) -> AsyncIterator[API_Challenge_Reponse]:
+        await self.request_scheduler.throttle(Request_Class.CHALLENGE)
         try:
             async with self.lichess_session.post(f'/api/challenge/{challenge_request.opponent_username}',
                                                  data={'rated': 'true' if challenge_request.rated else 'false',
@@ -126,14 +148,14 @@ class API:
                                                  ) as response:
 
                 if response.status == 429:
+                    self.request_scheduler.back_off(Request_Class.CHALLENGE)
                     yield API_Challenge_Reponse(has_reached_rate_limit=True)
                     return
 
                 async for line in response.content:
-                    if not line.strip():
+                    if (data := decode_line(line)) is None:
                         continue
 
-                    data: dict[str, Any] = json.loads(line)
                     yield API_Challenge_Reponse(data.get('id'),
                                                 data.get('done') == 'accepted',
                                                 data.get('error'),
@@ -149,8 +171,8 @@ class API:
     @retry(**BASIC_RETRY_CONDITIONS)
     async def decline_challenge(self, challenge_id: str, reason: Decline_Reason) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/challenge/{challenge_id}/decline',
-                                                 data={'reason': reason}) as response:
+            async with self._post(Request_Class.CHALLENGE, f'/api/challenge/{challenge_id}/decline',
+                                  data={'reason': reason}) as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -159,7 +181,7 @@ class API:
 
     @retry(**JSON_RETRY_CONDITIONS)
     async def get_account(self) -> dict[str, Any]:
-        async with self.lichess_session.get('/api/account') as response:
+        async with self._get(Request_Class.OTHER, '/api/account') as response:
             json_response = await response.json()
 
             if 'error' in json_response:
@@ -167,9 +189,10 @@ class API:
 
             return json_response
 
+    @circuit_breaker('chessdb')
     async def get_chessdb_eval(self, fen: str, timeout: int) -> dict[str, Any] | None:
         try:
-            async with self.external_session.get('http://www.chessdb.cn/cdb.php',
+            async with self.external_session.get(f'{CHESSDB_URL}/cdb.php',
                                                  params={'action': 'queryall',
                                                          'board': fen,
                                                          'json': 1},
@@ -181,20 +204,27 @@ class API:
         except TimeoutError:
             print(f'ChessDB: Timed out after {timeout} second(s).')
 
+    @circuit_breaker('lichess_cloud')
     async def get_cloud_eval(self, fen: str, variant: Variant, timeout: int) -> dict[str, Any] | None:
         try:
-            async with self.lichess_session.get('/api/cloud-eval', params={'fen': fen, 'variant': variant},
-                                                timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            # The time spent waiting for the scheduler counts against the timeout as well.
+            async with asyncio.timeout(timeout), self._get(Request_Class.CLOUD_EVAL, '/api/cloud-eval',
+                                                           max_wait=timeout,
+                                                           params={'fen': fen, 'variant': variant}) as response:
+                if response.status == 404:
+                    return {'error': 'No cloud evaluation available'}
+
                 response.raise_for_status()
                 return await response.json()
         except (aiohttp.ClientError, json.JSONDecodeError) as e:
             print(f'Cloud: {e}')
-        except TimeoutError:
-            print(f'Cloud: Timed out after {timeout} second(s).')
+        except TimeoutError as e:
+            print(f'Cloud: {e}' if str(e) else f'Cloud: Timed out after {timeout} second(s).')
 
+    @circuit_breaker('online_egtb')
     async def get_egtb(self, fen: str, variant: str, timeout: int) -> dict[str, Any] | None:
         try:
-            async with self.external_session.get(f'https://tablebase.lichess.ovh/{variant}',
+            async with self.external_session.get(f'{TABLEBASE_URL}/{variant}',
                                                  params={'fen': fen},
                                                  timeout=aiohttp.ClientTimeout(total=timeout)) as response:
 
@@ -207,26 +237,28 @@ class API:
 
     @retry(**JSON_RETRY_CONDITIONS)
     async def get_event_stream(self, queue: asyncio.Queue[dict[str, Any]]) -> None:
+        await self.request_scheduler.throttle(Request_Class.OTHER)
         async with self.lichess_session.get('/api/stream/event',
                                             timeout=aiohttp.ClientTimeout(sock_read=9.0)) as response:
             async for line in response.content:
-                if line.strip():
-                    await queue.put(json.loads(line))
+                if (event := decode_line(line)) is not None:
+                    await queue.put(event)
 
-    @retry(**GAME_STREAM_RETRY_CONDITIONS)
-    async def get_game_stream(self, game_id: str, queue: asyncio.Queue[dict[str, Any]]) -> None:
+    async def get_game_stream(self, game_id: str) -> AsyncIterator[dict[str, Any] | None]:
+        await self.request_scheduler.throttle(Request_Class.GAME)
         async with self.lichess_session.get(f'/api/bot/game/stream/{game_id}',
                                             timeout=aiohttp.ClientTimeout(sock_read=9.0)) as response:
             async for line in response.content:
-                if line.strip():
-                    await queue.put(json.loads(line))
+                # Keep-alive lines are passed on as None for the stall detection.
+                yield decode_line(line)
 
     @retry(**JSON_RETRY_CONDITIONS)
     async def get_online_bots(self) -> list[dict[str, Any]]:
-        async with self.lichess_session.get('/api/bot/online',
-                                            timeout=aiohttp.ClientTimeout(sock_read=9.0)) as response:
-            return [json.loads(line) async for line in response.content if line.strip()]
+        async with self._get(Request_Class.STATUS, '/api/bot/online',
+                             timeout=aiohttp.ClientTimeout(sock_read=9.0)) as response:
+            return [bot async for line in response.content if (bot := decode_line(line)) is not None]
 
+    @circuit_breaker('opening_explorer')
     async def get_opening_explorer(self,
                                    username: str,
                                    fen: str,
@@ -242,13 +274,13 @@ class API:
         if modes:
             params['modes'] = modes
         try:
-            async with self.external_session.get('https://explorer.lichess.ovh/player',
+            async with self.external_session.get(f'{EXPLORER_URL}/player',
                                                  params=params,
                                                  timeout=aiohttp.ClientTimeout(total=timeout)) as response:
                 response.raise_for_status()
                 async for line in response.content:
-                    if line.strip():
-                        return json.loads(line)
+                    if (json_response := decode_line(line)) is not None:
+                        return json_response
         except (aiohttp.ClientError, json.JSONDecodeError) as e:
             print(f'Explore: {e}')
         except TimeoutError:
@@ -256,25 +288,25 @@ class API:
 
     @retry(**JSON_RETRY_CONDITIONS)
     async def get_token_scopes(self, token: str) -> str:
-        async with self.lichess_session.post('/api/token/test', data=token) as response:
+        async with self._post(Request_Class.OTHER, '/api/token/test', data=token) as response:
             json_response = await response.json()
             return json_response[token]['scopes']
 
     @retry(**JSON_RETRY_CONDITIONS)
     async def get_tournament_info(self, tournament_id: str) -> dict[str, Any]:
-        async with self.lichess_session.get(f'/api/tournament/{tournament_id}') as response:
+        async with self._get(Request_Class.STATUS, f'/api/tournament/{tournament_id}') as response:
             return await response.json()
 
     @retry(**JSON_RETRY_CONDITIONS)
-    async def get_user_status(self, username: str) -> dict[str, Any]:
-        async with self.lichess_session.get('/api/users/status', params={'ids': username}) as response:
-            json_response = await response.json()
-            return json_response[0]
+    async def get_users_status(self, usernames: list[str]) -> list[dict[str, Any]]:
+        async with self._get(Request_Class.STATUS, '/api/users/status',
+                             params={'ids': ','.join(usernames)}) as response:
+            return await response.json()
 
     @retry(**JSON_RETRY_CONDITIONS)
     async def join_team(self, team: str, password: str | None) -> bool:
         data = {'password': password} if password else None
-        async with self.lichess_session.post(f'/team/{team.lower()}/join', data=data) as response:
+        async with self._post(Request_Class.OTHER, f'/team/{team.lower()}/join', data=data) as response:
             json_response = await response.json()
             if 'error' in json_response:
                 print(f'Joining team "{team}" failed: {json_response["error"]}')
@@ -288,7 +320,7 @@ class API:
             data['team'] = team.lower()
         if password:
             data['password'] = password
-        async with self.lichess_session.post(f'/api/tournament/{tournament_id}/join', data=data) as response:
+        async with self._post(Request_Class.OTHER, f'/api/tournament/{tournament_id}/join', data=data) as response:
             json_response = await response.json()
             if 'error' in json_response:
                 print(f'Joining tournament "{tournament_id}" failed: {json_response["error"]}')
@@ -298,7 +330,7 @@ class API:
     @retry(**BASIC_RETRY_CONDITIONS)
     async def resign_game(self, game_id: str) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/bot/game/{game_id}/resign') as response:
+            async with self._post(Request_Class.GAME, f'/api/bot/game/{game_id}/resign') as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -307,9 +339,9 @@ class API:
 
     async def send_chat_message(self, game_id: str, room: str, text: str) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/bot/game/{game_id}/chat',
-                                                 data={'room': room, 'text': text},
-                                                 timeout=aiohttp.ClientTimeout(total=1.0)) as response:
+            async with self._post(Request_Class.CHAT, f'/api/bot/game/{game_id}/chat',
+                                  data={'room': room, 'text': text},
+                                  timeout=aiohttp.ClientTimeout(total=1.0)) as response:
                 response.raise_for_status()
                 return True
         except (aiohttp.ClientError, TimeoutError):
@@ -318,9 +350,9 @@ class API:
     @retry(**MOVE_RETRY_CONDITIONS)
     async def send_move(self, game_id: str, uci_move: str, offer_draw: bool) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/bot/game/{game_id}/move/{uci_move}',
-                                                 params={'offeringDraw': 'true' if offer_draw else 'false'},
-                                                 timeout=aiohttp.ClientTimeout(total=1.0)) as response:
+            async with self._post(Request_Class.MOVE, f'/api/bot/game/{game_id}/move/{uci_move}',
+                                  params={'offeringDraw': 'true' if offer_draw else 'false'},
+                                  timeout=aiohttp.ClientTimeout(total=1.0)) as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -333,7 +365,7 @@ class API:
     @retry(**BASIC_RETRY_CONDITIONS)
     async def upgrade_account(self) -> bool:
         try:
-            async with self.lichess_session.post('/api/bot/account/upgrade') as response:
+            async with self._post(Request_Class.OTHER, '/api/bot/account/upgrade') as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
@@ -343,9 +375,57 @@ class API:
     @retry(**BASIC_RETRY_CONDITIONS)
     async def withdraw_tournament(self, tournament_id: str) -> bool:
         try:
-            async with self.lichess_session.post(f'/api/tournament/{tournament_id}/withdraw') as response:
+            async with self._post(Request_Class.OTHER, f'/api/tournament/{tournament_id}/withdraw') as response:
                 response.raise_for_status()
                 return True
         except aiohttp.ClientResponseError as e:
             print(e)
             return False
+
+    @asynccontextmanager
+    async def _get(self,
+                   request_class: Request_Class,
+                   url: str,
+                   max_wait: float | None = None,
+                   **kwargs: Any
+                   ) -> AsyncIterator[aiohttp.ClientResponse]:
+        async with self.request_scheduler.schedule(request_class, max_wait):
+            async with self.lichess_session.get(url, **kwargs) as response:
+                if response.status == 429:
+                    self.request_scheduler.back_off(request_class)
+                yield response
+
+    @asynccontextmanager
+    async def _post(self,
+                    request_class: Request_Class,
+                    url: str,
+                    **kwargs: Any
+                    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        async with self.request_scheduler.schedule(request_class):
+            async with self.lichess_session.post(url, **kwargs) as response:
+                if response.status == 429:
+                    self.request_scheduler.back_off(request_class)
+                yield response
+
+    async def _keep_warm(self) -> None:
+        # A single lichess connection is warmed, games open their streams once they start.
+        await asyncio.gather(*(self._warm_up(self.external_session, url) for url in self.external_urls),
+                             self._warm_up_lichess())
+
+        while True:
+            await asyncio.sleep(WARM_UP_INTERVAL - min(self.lichess_stats.idle_time, WARM_UP_INTERVAL) + 1.0)
+
+            if self.lichess_stats.idle_time >= WARM_UP_INTERVAL:
+                await self._warm_up_lichess()
+
+    async def _warm_up_lichess(self) -> None:
+        await self.request_scheduler.throttle(Request_Class.OTHER)
+        await self._warm_up(self.lichess_session, '/')
+
+    @staticmethod
+    async def _warm_up(session: aiohttp.ClientSession, url: str) -> None:
+        try:
+            async with session.head(url, timeout=aiohttp.ClientTimeout(total=5.0)):
+                pass
+        except (aiohttp.ClientError, TimeoutError) as e:
+            logger.debug('Warming up "%s" failed: %r', url, e)
@@ -0,0 +1,217 @@
+import argparse
+import heapq
+import io
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from functools import partial
+from itertools import groupby, islice
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+from book_registry import encode_learn
+
+ENTRY_STRUCT = struct.Struct('>QHHI')
+RECORD_STRUCT = struct.Struct('>QHdIIIdI')
+PROMOTION_CODES = {chess.KNIGHT: 1, chess.BISHOP: 2, chess.ROOK: 3, chess.QUEEN: 4}
+RESULTS = {'1-0': (1, 0, 0), '1/2-1/2': (0, 1, 0), '0-1': (0, 0, 1)}
+MAX_WEIGHT = 0xFFFF
+
+# key, raw move, weight, wins, draws, losses, opponent rating sum, rated games
+Record = tuple[int, int, float, int, int, int, float, int]
+
+
+class Book_Builder:
+    def __init__(self,
+                 max_ply: int,
+                 min_games: int,
+                 min_rating: int,
+                 player: str | None,
+                 chunk_size: int,
+                 workers: int) -> None:
+        self.max_ply = max_ply
+        self.min_games = min_games
+        self.min_rating = min_rating
+        self.player = player.lower() if player else None
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def build(self, pgn_paths: list[str], output_path: str) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            chunk_paths = self._write_chunks(pgn_paths, temp_dir)
+            entry_count = self._write_book(self._merge_chunks(chunk_paths), output_path)
+
+        print(f'Wrote {entry_count} entries to "{output_path}".')
+
+    def _write_chunks(self, pgn_paths: list[str], temp_dir: str) -> list[str]:
+        positions: dict[tuple[int, int], list[float]] = {}
+        chunk_paths: list[str] = []
+        game_count = 0
+        start_time = time.perf_counter()
+        parse_game = partial(_parse_game, self.max_ply, self.min_rating, self.player)
+
+        with multiprocessing.Pool(self.workers) as pool:
+            for records in pool.imap_unordered(parse_game, self._read_games(pgn_paths), chunksize=64):
+                game_count += 1
+                for key, raw_move, *values in records:
+                    if position := positions.get((key, raw_move)):
+                        for index, value in enumerate(values):
+                            position[index] += value
+                    else:
+                        positions[(key, raw_move)] = list(values)
+
+                if len(positions) >= self.chunk_size:
+                    chunk_paths.append(self._write_chunk(positions, temp_dir, len(chunk_paths)))
+                    positions.clear()
+
+                if game_count % 10_000 == 0:
+                    self._print_progress(game_count, start_time)
+
+        if positions:
+            chunk_paths.append(self._write_chunk(positions, temp_dir, len(chunk_paths)))
+
+        self._print_progress(game_count, start_time)
+        return chunk_paths
+
+    @staticmethod
+    def _read_games(pgn_paths: list[str]) -> Iterator[str]:
+        for pgn_path in pgn_paths:
+            with open(pgn_path, encoding='utf-8', errors='replace') as pgn_file:
+                lines: list[str] = []
+                has_moves = False
+                for line in pgn_file:
+                    if line.startswith('['):
+                        if has_moves:
+                            yield ''.join(lines)
+                            lines.clear()
+                            has_moves = False
+                    elif line.strip():
+                        has_moves = True
+
+                    lines.append(line)
+
+                if has_moves:
+                    yield ''.join(lines)
+
+    @staticmethod
+    def _write_chunk(positions: dict[tuple[int, int], list[float]], temp_dir: str, index: int) -> str:
+        chunk_path = os.path.join(temp_dir, f'chunk_{index}.bin')
+        with open(chunk_path, 'wb') as chunk_file:
+            for (key, raw_move), (weight, wins, draws, losses, opponent_rating_sum, rated_games) in sorted(
+                    positions.items()):
+                chunk_file.write(RECORD_STRUCT.pack(key, raw_move, weight, int(wins), int(draws), int(losses),
+                                                    opponent_rating_sum, int(rated_games)))
+
+        return chunk_path
+
+    @staticmethod
+    def _read_chunk(chunk_path: str) -> Iterator[Record]:
+        with open(chunk_path, 'rb') as chunk_file:
+            while data := chunk_file.read(RECORD_STRUCT.size * 4096):
+                yield from RECORD_STRUCT.iter_unpack(data)
+
+    def _merge_chunks(self, chunk_paths: list[str]) -> Iterator[Record]:
+        merged_records = heapq.merge(*(self._read_chunk(chunk_path) for chunk_path in chunk_paths))
+        for (key, raw_move), records in groupby(merged_records, key=lambda record: (record[0], record[1])):
+            weight, wins, draws, losses, opponent_rating_sum, rated_games = map(
+                sum, zip(*(record[2:] for record in records)))
+            yield key, raw_move, weight, int(wins), int(draws), int(losses), opponent_rating_sum, int(rated_games)
+
+    def _write_book(self, records: Iterable[Record], output_path: str) -> int:
+        entry_count = 0
+        temp_path = f'{output_path}.tmp'
+
+        with open(temp_path, 'wb') as book_file:
+            for key, position_records in groupby(records, key=lambda record: record[0]):
+                candidates = [record for record in position_records
+                              if record[3] + record[4] + record[5] >= self.min_games and record[2] > 0.0]
+                if not candidates:
+                    continue
+
+                max_weight = max(record[2] for record in candidates)
+                for _, raw_move, weight, wins, draws, losses, opponent_rating_sum, rated_games in candidates:
+                    book_weight = max(round(weight / max_weight * MAX_WEIGHT), 1)
+                    learn = encode_learn(wins, draws, losses, opponent_rating_sum, rated_games)
+                    book_file.write(ENTRY_STRUCT.pack(key, raw_move, book_weight, learn))
+                    entry_count += 1
+
+        os.replace(temp_path, output_path)
+        return entry_count
+
+    @staticmethod
+    def _print_progress(game_count: int, start_time: float) -> None:
+        duration = time.perf_counter() - start_time
+        print(f'Games: {game_count}     Games/s: {game_count / max(duration, 1e-9):.0f}')
+
+
+def _parse_game(max_ply: int, min_rating: int, player: str | None, pgn_text: str) -> list[Record]:
+    game = chess.pgn.read_game(io.StringIO(pgn_text))
+    if game is None or game.errors or game.headers.get('Result') not in RESULTS:
+        return []
+
+    board = game.board()
+    if board.uci_variant != 'chess' or board.chess960:
+        return []
+
+    white_win, draw, black_win = RESULTS[game.headers['Result']]
+    names = {chess.WHITE: game.headers.get('White', '').lower(), chess.BLACK: game.headers.get('Black', '').lower()}
+    ratings = {chess.WHITE: _get_rating(game.headers.get('WhiteElo')),
+               chess.BLACK: _get_rating(game.headers.get('BlackElo'))}
+
+    records: list[Record] = []
+    for move in islice(game.mainline_moves(), max_ply):
+        rating = ratings[board.turn]
+        opponent_rating = ratings[not board.turn]
+        is_player = player is None or names[board.turn] == player
+        if is_player and (not min_rating or (rating is not None and rating >= min_rating)):
+            win, loss = (white_win, black_win) if board.turn else (black_win, white_win)
+            rating_factor = 1.0 if rating is None else 2.0 ** ((rating - 2000) / 400)
+            records.append((chess.polyglot.zobrist_hash(board),
+                            _encode_move(board, move),
+                            (2 * win + draw) * rating_factor,
+                            win, draw, loss,
+                            float(opponent_rating or 0),
+                            0 if opponent_rating is None else 1))
+
+        board.push(move)
+
+    return records
+
+
+def _get_rating(rating: str | None) -> int | None:
+    if rating and rating.isdigit():
+        return int(rating)
+
+
+def _encode_move(board: chess.Board, move: chess.Move) -> int:
+    to_square = move.to_square
+    if board.is_castling(move):
+        to_square = chess.square(7 if board.is_kingside_castling(move) else 0, chess.square_rank(move.from_square))
+
+    return to_square | move.from_square << 6 | PROMOTION_CODES.get(move.promotion or 0, 0) << 12
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a polyglot opening book from PGN files.')
+    parser.add_argument('pgn', nargs='+', type=str, help='Path to PGN file(s).')
+    parser.add_argument('--output', '-o', required=True, type=str, help='Path of the polyglot book to write.')
+    parser.add_argument('--max-ply', default=30, type=int, help='Half moves per game added to the book.')
+    parser.add_argument('--min-games', default=1, type=int, help='Games a move must have been played in.')
+    parser.add_argument('--min-rating', default=0, type=int, help='Minimum rating of the player making the move.')
+    parser.add_argument('--player', type=str, help='Only add moves of this player, e.g. the bot account.')
+    parser.add_argument('--chunk-size', default=1_000_000, type=int,
+                        help='Positions held in memory before they are sorted to disk.')
+    parser.add_argument('--workers', default=os.cpu_count() or 1, type=int, help='Number of parsing processes.')
+    args = parser.parse_args()
+
+    Book_Builder(args.max_ply,
+                 args.min_games,
+                 args.min_rating,
+                 args.player,
+                 args.chunk_size,
+                 args.workers).build(args.pgn, args.output)
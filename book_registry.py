@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import time
+
+import chess
+import chess.polyglot
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+RELOAD_CHECK_INTERVAL = 10.0
+LEARN_WRITE_INTERVAL = 60.0
+MAX_PERFORMANCE = 0xFFF
+# The learn field of a book holds rates only, it is weighted like this many games against the bot's own results.
+BOOK_LEARN_GAMES = 20
+
+# wins, draws, losses, opponent rating sum, rated games
+Learn_Stats = list[float]
+
+
+def encode_learn(wins: float, draws: float, losses: float, opponent_rating_sum: float, rated_games: float) -> int:
+    games = wins + draws + losses
+    if not games:
+        return 0
+
+    performance = 0
+    if rated_games:
+        performance = round(opponent_rating_sum / rated_games + 400 * (wins - losses) / games)
+        performance = min(max(performance, 0), MAX_PERFORMANCE)
+
+    win = round(wins / games * 100.0 * 10.2)
+    draw = round(draws / games * 100.0 * 10.2)
+    return performance << 20 | win << 10 | draw
+
+
+def decode_learn(learn: int) -> Learn_Stats:
+    if not learn:
+        return [0.0] * 5
+
+    performance = learn >> 20
+    wins = (learn >> 10 & 0x3FF) / (100.0 * 10.2) * BOOK_LEARN_GAMES
+    draws = (learn & 0x3FF) / (100.0 * 10.2) * BOOK_LEARN_GAMES
+    losses = max(BOOK_LEARN_GAMES - wins - draws, 0.0)
+    if not performance:
+        return [wins, draws, losses, 0.0, 0.0]
+
+    average_opponent_rating = performance - 400 * (wins - losses) / BOOK_LEARN_GAMES
+    return [wins, draws, losses, average_opponent_rating * BOOK_LEARN_GAMES, BOOK_LEARN_GAMES]
+
+
+def add_learn_stats(stats: Learn_Stats, other_stats: Learn_Stats) -> Learn_Stats:
+    return [value + other_value for value, other_value in zip(stats, other_stats)]
+
+
+class Book_Registry:
+    def __init__(self) -> None:
+        self.readers: dict[str, chess.polyglot.MemoryMappedReader] = {}
+        self.mtimes: dict[str, float] = {}
+        self.check_times: dict[str, float] = {}
+        self.ref_counts: dict[str, int] = {}
+        self.learn_stats: dict[str, dict[tuple[int, int], Learn_Stats]] = {}
+        self.pending_learn_stats: dict[str, dict[tuple[int, int], Learn_Stats]] = {}
+        self.learn_write_times: dict[str, float] = {}
+
+    async def acquire(self, path: str) -> None:
+        self.ref_counts[path] = self.ref_counts.get(path, 0) + 1
+        if path in self.readers:
+            return
+
+        self.readers[path] = chess.polyglot.open_reader(path)
+        self.mtimes[path] = os.path.getmtime(path)
+        self.check_times[path] = time.monotonic()
+        self.learn_stats[path] = {}
+        self.pending_learn_stats[path] = {}
+        self.learn_write_times[path] = time.monotonic()
+
+        # The sidecar is read off the event loop, results added in the meantime are kept.
+        learn_stats = await asyncio.to_thread(self._read_learn_file, path)
+        if path in self.learn_stats:
+            self.learn_stats[path] = self._merge_learn_stats(learn_stats, self.learn_stats[path])
+
+    async def release(self, path: str) -> None:
+        if path not in self.ref_counts:
+            return
+
+        self.ref_counts[path] -= 1
+        if self.ref_counts[path] == 0:
+            pending_learn_stats = self.pending_learn_stats.pop(path)
+            self.readers.pop(path).close()
+            del self.mtimes[path]
+            del self.check_times[path]
+            del self.learn_stats[path]
+            del self.learn_write_times[path]
+            del self.ref_counts[path]
+
+            if pending_learn_stats:
+                await asyncio.to_thread(self._write_learn_file, path, pending_learn_stats)
+
+    def find_all(self, path: str, board: chess.Board) -> list[chess.polyglot.Entry]:
+        self._check_reload(path)
+        entries = list(self.readers[path].find_all(board))
+
+        learn_stats = self.learn_stats[path]
+        if not learn_stats:
+            return entries
+
+        # The bot's own results are added to the learn data the book was built with.
+        return [entry._replace(learn=encode_learn(*add_learn_stats(decode_learn(entry.learn),
+                                                                   learn_stats[(entry.key, entry.raw_move)])))
+                if (entry.key, entry.raw_move) in learn_stats else entry
+                for entry in entries]
+
+    async def add_result(self,
+                         path: str,
+                         entry: chess.polyglot.Entry,
+                         score: float,
+                         opponent_rating: int | None) -> None:
+        if path not in self.readers:
+            return
+
+        result = [float(score == 1.0), float(score == 0.5), float(score == 0.0),
+                  float(opponent_rating or 0), float(opponent_rating is not None)]
+        for stats in (self.learn_stats[path], self.pending_learn_stats[path]):
+            stats[(entry.key, entry.raw_move)] = add_learn_stats(stats.get((entry.key, entry.raw_move), [0.0] * 5),
+                                                                 result)
+
+        if time.monotonic() - self.learn_write_times[path] >= LEARN_WRITE_INTERVAL:
+            await self.write_learn(path)
+
+    async def write_learn(self, path: str) -> None:
+        self.learn_write_times[path] = time.monotonic()
+        pending_learn_stats = self.pending_learn_stats[path]
+        if not pending_learn_stats:
+            return
+
+        self.pending_learn_stats[path] = {}
+        learn_stats = await asyncio.to_thread(self._write_learn_file, path, pending_learn_stats)
+        if path not in self.pending_learn_stats:
+            return
+
+        if learn_stats is None:
+            self.pending_learn_stats[path] = self._merge_learn_stats(pending_learn_stats,
+                                                                     self.pending_learn_stats[path])
+            return
+
+        self.learn_stats[path] = self._merge_learn_stats(learn_stats, self.pending_learn_stats[path])
+
+    def _write_learn_file(self,
+                          path: str,
+                          pending_learn_stats: dict[tuple[int, int], Learn_Stats]
+                          ) -> dict[tuple[int, int], Learn_Stats] | None:
+        learn_path = f'{path}.learn'
+        try:
+            with open(f'{learn_path}.lock', 'w', encoding='utf-8') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+                learn_stats = self._merge_learn_stats(self._read_learn_file(path), pending_learn_stats)
+                temp_path = f'{learn_path}.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as learn_file:
+                    json.dump([[*key, *stats] for key, stats in learn_stats.items()], learn_file)
+                os.replace(temp_path, learn_path)
+        except OSError as e:
+            print(f'Book learning for "{path}" could not be saved: {e}')
+            return
+
+        return learn_stats
+
+    @staticmethod
+    def _merge_learn_stats(learn_stats: dict[tuple[int, int], Learn_Stats],
+                           other_learn_stats: dict[tuple[int, int], Learn_Stats]
+                           ) -> dict[tuple[int, int], Learn_Stats]:
+        merged_learn_stats = dict(learn_stats)
+        for key, stats in other_learn_stats.items():
+            merged_learn_stats[key] = add_learn_stats(merged_learn_stats.get(key, [0.0] * 5), stats)
+
+        return merged_learn_stats
+
+    @staticmethod
+    def _read_learn_file(path: str) -> dict[tuple[int, int], Learn_Stats]:
+        try:
+            with open(f'{path}.learn', encoding='utf-8') as learn_file:
+                return {(key, raw_move): stats for key, raw_move, *stats in json.load(learn_file)}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f'Book learning for "{path}" could not be loaded: {e}')
+            return {}
+
+    def _check_reload(self, path: str) -> None:
+        now = time.monotonic()
+        if now - self.check_times[path] < RELOAD_CHECK_INTERVAL:
+            return
+
+        self.check_times[path] = now
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime == self.mtimes[path]:
+                return
+
+            reader = chess.polyglot.open_reader(path)
+        except (OSError, ValueError) as e:
+            print(f'Book "{path}" could not be reloaded: {e}')
+            return
+
+        print(f'Reloading book "{path}" ...')
+        self.readers.pop(path).close()
+        self.readers[path] = reader
+        self.mtimes[path] = mtime
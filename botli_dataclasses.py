@@ -5,7 +5,7 @@ from typing import Any, Literal
 
 import chess
 import chess.engine
-from chess.polyglot import MemoryMappedReader
+import chess.polyglot
 
 from enums import Challenge_Color, Perf_Type, Variant
 
@@ -26,7 +26,7 @@ class API_Challenge_Reponse:
 class Book_Settings:
     selection: Literal['weighted_random', 'uniform_random', 'best_move'] = 'best_move'
     max_depth: int | None = None
-    readers: dict[str, MemoryMappedReader] = field(default_factory=dict)
+    paths: dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
@@ -41,6 +41,12 @@ class Bot:
         return NotImplemented
 
 
+@dataclass
+class Cached_Response:
+    response: dict[str, Any]
+    fetch_time: float
+
+
 @dataclass
 class Challenge:
     challenge_id: str
@@ -297,6 +303,15 @@ class Move_Response:
     is_drawish: bool = field(default=False, kw_only=True)
     is_resignable: bool = field(default=False, kw_only=True)
     is_engine_move: bool = field(default=False, kw_only=True)
+    book_entry: tuple[str, chess.polyglot.Entry] | None = field(default=None, kw_only=True)
+
+
+@dataclass
+class Outgoing_Chat_Message:
+    room: str
+    text: str
+    is_eval: bool
+    queue_time: float
 
 
 @dataclass
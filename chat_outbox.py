@@ -0,0 +1,78 @@
+import asyncio
+import time
+from collections import deque
+
+from api import API
+from botli_dataclasses import Outgoing_Chat_Message
+
+MAX_QUEUED_MESSAGES = 16
+CLOSE_TIMEOUT = 5.0
+
+
+class Chat_Outbox:
+    def __init__(self, api: API) -> None:
+        self.api = api
+        self.queues: dict[str, deque[Outgoing_Chat_Message]] = {}
+        self.tasks: dict[str, asyncio.Task[None]] = {}
+        self.max_depth = 0
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+
+    def send(self, game_id: str, room: str, text: str, is_eval: bool = False) -> None:
+        queue = self.queues.setdefault(game_id, deque())
+
+        if is_eval:
+            # Only the latest evaluation is worth sending, older ones of the same room are replaced.
+            superseded = [message for message in queue if message.is_eval and message.room == room]
+            for message in superseded:
+                queue.remove(message)
+            self.coalesced += len(superseded)
+
+        if len(queue) >= MAX_QUEUED_MESSAGES:
+            queue.popleft()
+            self.dropped += 1
+
+        queue.append(Outgoing_Chat_Message(room, text, is_eval, time.monotonic()))
+        self.max_depth = max(self.max_depth, self.depth)
+
+        if game_id not in self.tasks:
+            self.tasks[game_id] = asyncio.create_task(self._run(game_id))
+
+    async def close(self) -> None:
+        if not self.tasks:
+            return
+
+        # Messages of the last games, e.g. their goodbyes, still get a moment to go out before the session closes.
+        _, pending = await asyncio.wait(list(self.tasks.values()), timeout=CLOSE_TIMEOUT)
+        for task in pending:
+            task.cancel()
+
+        if pending:
+            await asyncio.wait(pending)
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def stats_str(self) -> str:
+        average_wait = self.total_wait / (self.sent + self.failed) if self.sent + self.failed else 0.0
+        return (f'Chat: {self.sent} sent {self.failed} failed {self.coalesced} coalesced {self.dropped} dropped     '
+                f'Queued: {self.depth} ({self.max_depth} max)     Wait: {average_wait * 1000:.0f} ms avg')
+
+    async def _run(self, game_id: str) -> None:
+        queue = self.queues[game_id]
+        try:
+            while queue:
+                message = queue.popleft()
+                self.total_wait += time.monotonic() - message.queue_time
+                if await self.api.send_chat_message(game_id, message.room, message.text):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+        finally:
+            del self.queues[game_id]
+            del self.tasks[game_id]
@@ -4,21 +4,21 @@ from collections import defaultdict
 
 import psutil
 
-from api import API
 from botli_dataclasses import Chat_Message, Game_Information
+from chat_outbox import Chat_Outbox
 from config import Config
 from lichess_game import Lichess_Game
 
 
 class Chatter:
     def __init__(self,
-                 api: API,
+                 chat_outbox: Chat_Outbox,
                  config: Config,
                  username: str,
                  game_information: Game_Information,
                  lichess_game: Lichess_Game
                  ) -> None:
-        self.api = api
+        self.chat_outbox = chat_outbox
         self.username = username
         self.game_info = game_information
         self.lichess_game = lichess_game
@@ -32,7 +32,7 @@ class Chatter:
         self.spectator_goodbye = self._format_message(config.messages.goodbye_spectators)
         self.print_eval_rooms: set[str] = set()
 
-    async def handle_chat_message(self, chatLine_Event: dict) -> None:
+    def handle_chat_message(self, chatLine_Event: dict) -> None:
         chat_message = Chat_Message.from_chatLine_event(chatLine_Event)
 
         if chat_message.username == 'lichess':
@@ -49,62 +49,62 @@ class Chatter:
             print(output)
 
         if chat_message.text.startswith('!'):
-            await self._handle_command(chat_message)
+            self._handle_command(chat_message)
 
-    async def print_eval(self) -> None:
+    def print_eval(self) -> None:
         if not self.game_info.increment_ms and self.lichess_game.own_time < 30.0:
             return
 
         for room in self.print_eval_rooms:
-            await self._send_last_message(room)
+            self._send_last_message(room)
 
-    async def send_greetings(self) -> None:
+    def send_greetings(self) -> None:
         if self.player_greeting:
-            await self.api.send_chat_message(self.game_info.id_, 'player', self.player_greeting)
+            self.chat_outbox.send(self.game_info.id_, 'player', self.player_greeting)
 
         if self.spectator_greeting:
-            await self.api.send_chat_message(self.game_info.id_, 'spectator', self.spectator_greeting)
+            self.chat_outbox.send(self.game_info.id_, 'spectator', self.spectator_greeting)
 
-    async def send_goodbyes(self) -> None:
+    def send_goodbyes(self) -> None:
         if self.lichess_game.is_abortable:
             return
 
         if self.player_goodbye:
-            await self.api.send_chat_message(self.game_info.id_, 'player', self.player_goodbye)
+            self.chat_outbox.send(self.game_info.id_, 'player', self.player_goodbye)
 
         if self.spectator_goodbye:
-            await self.api.send_chat_message(self.game_info.id_, 'spectator', self.spectator_goodbye)
+            self.chat_outbox.send(self.game_info.id_, 'spectator', self.spectator_goodbye)
 
-    async def send_abortion_message(self) -> None:
-        await self.api.send_chat_message(self.game_info.id_, 'player', ('Too bad you weren\'t there. '
-                                                                        'Feel free to challenge me again, '
-                                                                        'I will accept the challenge if possible.'))
+    def send_abortion_message(self) -> None:
+        self.chat_outbox.send(self.game_info.id_, 'player', ('Too bad you weren\'t there. '
+                                                             'Feel free to challenge me again, '
+                                                             'I will accept the challenge if possible.'))
 
-    async def _handle_command(self, chat_message: Chat_Message) -> None:
+    def _handle_command(self, chat_message: Chat_Message) -> None:
         match chat_message.text[1:].lower():
             case 'cpu':
-                await self.api.send_chat_message(self.game_info.id_, chat_message.room, self.cpu_message)
+                self.chat_outbox.send(self.game_info.id_, chat_message.room, self.cpu_message)
             case 'draw':
-                await self.api.send_chat_message(self.game_info.id_, chat_message.room, self.draw_message)
+                self.chat_outbox.send(self.game_info.id_, chat_message.room, self.draw_message)
             case 'eval':
-                await self._send_last_message(chat_message.room)
+                self._send_last_message(chat_message.room)
             case 'motor':
-                await self.api.send_chat_message(self.game_info.id_, chat_message.room, self.lichess_game.engine.name)
+                self.chat_outbox.send(self.game_info.id_, chat_message.room, self.lichess_game.engine.name)
             case 'name':
-                await self.api.send_chat_message(self.game_info.id_, chat_message.room, self.name_message)
+                self.chat_outbox.send(self.game_info.id_, chat_message.room, self.name_message)
             case 'printeval':
                 if not self.game_info.increment_ms and self.game_info.initial_time_ms < 180_000:
-                    await self._send_last_message(chat_message.room)
+                    self._send_last_message(chat_message.room)
                     return
 
                 if chat_message.room in self.print_eval_rooms:
                     return
 
                 self.print_eval_rooms.add(chat_message.room)
-                await self.api.send_chat_message(self.game_info.id_,
-                                                 chat_message.room,
-                                                 'Type !quiet to stop eval printing.')
-                await self._send_last_message(chat_message.room)
+                self.chat_outbox.send(self.game_info.id_,
+                                      chat_message.room,
+                                      'Type !quiet to stop eval printing.')
+                self._send_last_message(chat_message.room)
             case 'quiet':
                 self.print_eval_rooms.discard(chat_message.room)
             case 'pv':
@@ -114,25 +114,25 @@ class Chatter:
                 if not (message := self._append_pv()):
                     message = 'No PV available.'
 
-                await self.api.send_chat_message(self.game_info.id_, chat_message.room, message)
+                self.chat_outbox.send(self.game_info.id_, chat_message.room, message)
             case 'ram':
-                await self.api.send_chat_message(self.game_info.id_, chat_message.room, self.ram_message)
+                self.chat_outbox.send(self.game_info.id_, chat_message.room, self.ram_message)
             case 'help' | 'commands':
                 if chat_message.room == 'player':
                     message = 'Supported commands: !cpu, !draw, !eval, !motor, !name, !printeval, !ram'
                 else:
                     message = 'Supported commands: !cpu, !draw, !eval, !motor, !name, !printeval, !pv, !ram'
 
-                await self.api.send_chat_message(self.game_info.id_, chat_message.room, message)
+                self.chat_outbox.send(self.game_info.id_, chat_message.room, message)
 
-    async def _send_last_message(self, room: str) -> None:
+    def _send_last_message(self, room: str) -> None:
         last_message = self.lichess_game.last_message.replace('Engine', 'Evaluation')
         last_message = ' '.join(last_message.split())
 
         if room == 'spectator':
             last_message = self._append_pv(last_message)
 
-        await self.api.send_chat_message(self.game_info.id_, room, last_message)
+        self.chat_outbox.send(self.game_info.id_, room, last_message, is_eval=True)
 
     def _get_cpu(self) -> str:
         cpu = ''
@@ -0,0 +1,135 @@
+import asyncio
+import functools
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, ParamSpec
+
+FAILURE_THRESHOLD = 3
+BASE_OPEN_TIME = 10.0
+MAX_OPEN_TIME = 300.0
+
+P = ParamSpec('P')
+Online_Call = Callable[P, Awaitable[dict[str, Any] | None]]
+
+
+class Circuit_Breaker:
+    breakers: dict[str, 'Circuit_Breaker'] = {}
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.consecutive_trips = 0
+        self.open_until = 0.0
+        self.open_time = 0.0
+        self.opened_at = 0.0
+        self.is_probing = False
+        self.calls = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.trips = 0
+        self.call_time = 0.0
+
+    @classmethod
+    def get(cls, service: str) -> 'Circuit_Breaker':
+        if service not in cls.breakers:
+            cls.breakers[service] = Circuit_Breaker(service)
+
+        return cls.breakers[service]
+
+    @property
+    def is_blocking(self) -> bool:
+        match self.state:
+            case 'open':
+                return time.monotonic() < self.open_until
+            case 'half_open':
+                return self.is_probing
+
+        return False
+
+    def allow(self) -> bool:
+        if self.state == 'open' and time.monotonic() >= self.open_until:
+            self.state = 'half_open'
+            self.open_time += time.monotonic() - self.opened_at
+
+        if self.is_blocking:
+            self.short_circuits += 1
+            return False
+
+        if self.state == 'half_open':
+            self.is_probing = True
+
+        return True
+
+    def record_success(self, duration: float) -> None:
+        self.calls += 1
+        self.call_time += duration
+        self.consecutive_failures = 0
+
+        if self.state == 'half_open':
+            print(f'{self.name}: Service recovered, closing circuit.')
+            self.state = 'closed'
+            self.consecutive_trips = 0
+            self.is_probing = False
+
+    def record_failure(self, duration: float) -> None:
+        self.calls += 1
+        self.failures += 1
+        self.call_time += duration
+        self.consecutive_failures += 1
+
+        if self.state == 'half_open' or (self.state == 'closed' and self.consecutive_failures >= FAILURE_THRESHOLD):
+            self._open()
+
+    def record_cancel(self) -> None:
+        if self.state == 'half_open':
+            self.is_probing = False
+
+    @property
+    def stats_str(self) -> str:
+        open_time = self.open_time + (time.monotonic() - self.opened_at if self.state == 'open' else 0.0)
+        average_call_time = self.call_time / self.calls if self.calls else 0.0
+        return (f'{self.name:16} {self.state:9} {self.calls:6} calls {self.failures} failed '
+                f'{self.short_circuits} short-circuited     Trips: {self.trips} ({open_time:.0f} s open)     '
+                f'Call: {average_call_time * 1000:.0f} ms avg')
+
+    def _open(self) -> None:
+        self.trips += 1
+        self.consecutive_trips += 1
+        open_seconds = min(BASE_OPEN_TIME * 2 ** (self.consecutive_trips - 1), MAX_OPEN_TIME)
+        open_seconds *= random.uniform(0.5, 1.5)
+
+        self.state = 'open'
+        self.is_probing = False
+        self.opened_at = time.monotonic()
+        self.open_until = self.opened_at + open_seconds
+        print(f'{self.name}: {self.consecutive_failures} consecutive failure(s), '
+              f'skipping the service for {open_seconds:.0f} seconds.')
+
+
+def circuit_breaker(service: str) -> Callable[[Online_Call[P]], Online_Call[P]]:
+    def decorator(func: Online_Call[P]) -> Online_Call[P]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> dict[str, Any] | None:
+            breaker = Circuit_Breaker.get(service)
+            if not breaker.allow():
+                return
+
+            start_time = time.perf_counter()
+            try:
+                response = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                breaker.record_cancel()
+                raise
+
+            if response is None:
+                breaker.record_failure(time.perf_counter() - start_time)
+            else:
+                breaker.record_success(time.perf_counter() - start_time)
+
+            return response
+
+        return wrapper
+
+    return decorator
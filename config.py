@@ -9,8 +9,8 @@ import yaml
 
 from configs import (Books_Config, Challenge_Config, ChessDB_Config, Engine_Config, Gaviota_Config,
                      Lichess_Cloud_Config, Matchmaking_Config, Matchmaking_Type_Config, Messages_Config,
-                     Offer_Draw_Config, Online_EGTB_Config, Online_Moves_Config, Opening_Books_Config,
-                     Opening_Explorer_Config, Resign_Config, Syzygy_Config)
+                     Offer_Draw_Config, Online_Cache_Config, Online_EGTB_Config, Online_Moves_Config,
+                     Opening_Books_Config, Opening_Explorer_Config, Racing_Config, Resign_Config, Syzygy_Config)
 
 
 @dataclass
@@ -206,7 +206,7 @@ class Config:
                 raise TypeError(f'`opening_books` subsection {subsection[2]}')
 
         if not config['opening_books']['enabled']:
-            return Opening_Books_Config(False, 0, None, {})
+            return Opening_Books_Config(False, 0, None, None, {})
 
         opening_book_types_sections = [
             ['selection', str, '"selection" must be one of "weighted_random", "uniform_random" or "best_move".'],
@@ -237,6 +237,7 @@ class Config:
         return Opening_Books_Config(config['opening_books']['enabled'],
                                     config['opening_books']['priority'],
                                     config['opening_books'].get('read_learn'),
+                                    config['opening_books'].get('write_learn'),
                                     books)
 
     @staticmethod
@@ -349,6 +350,34 @@ class Config:
                                   online_egtb_section['min_time'],
                                   online_egtb_section['timeout'])
 
+    @staticmethod
+    def _get_online_cache_config(cache_section: dict[str, Any]) -> Online_Cache_Config:
+        cache_sections = [
+            ['enabled', bool, '"enabled" must be a bool.'],
+            ['path', str, '"path" must be a string wrapped in quotes.'],
+            ['prefetch', bool, '"prefetch" must be a bool.']]
+
+        for subsection in cache_sections:
+            if subsection[0] in cache_section and not isinstance(cache_section[subsection[0]], subsection[1]):
+                raise TypeError(f'`online_moves` `cache` field {subsection[2]}')
+
+        return Online_Cache_Config(cache_section.get('enabled', False),
+                                   cache_section.get('path', 'position_cache.sqlite3'),
+                                   cache_section.get('prefetch', True))
+
+    @staticmethod
+    def _get_racing_config(racing_section: dict[str, Any]) -> Racing_Config:
+        racing_sections = [
+            ['enabled', bool, '"enabled" must be a bool.'],
+            ['latency_budget', int | float, '"latency_budget" must be a number.']]
+
+        for subsection in racing_sections:
+            if subsection[0] in racing_section and not isinstance(racing_section[subsection[0]], subsection[1]):
+                raise TypeError(f'`online_moves` `racing` field {subsection[2]}')
+
+        return Racing_Config(racing_section.get('enabled', False),
+                             racing_section.get('latency_budget', 2.0))
+
     @staticmethod
     def _get_online_moves_config(online_moves_section: dict[str, dict[str, Any]]) -> Online_Moves_Config:
         online_moves_sections = [
@@ -369,7 +398,9 @@ class Config:
         return Online_Moves_Config(Config._get_opening_explorer_config(online_moves_section['opening_explorer']),
                                    Config._get_lichess_cloud_config(online_moves_section['lichess_cloud']),
                                    Config._get_chessdb_config(online_moves_section['chessdb']),
-                                   Config._get_online_egtb_config(online_moves_section['online_egtb']))
+                                   Config._get_online_egtb_config(online_moves_section['online_egtb']),
+                                   Config._get_online_cache_config(online_moves_section.get('cache') or {}),
+                                   Config._get_racing_config(online_moves_section.get('racing') or {}))
 
     @staticmethod
     def _get_offer_draw_config(offer_draw_section: dict[str, Any]) -> Offer_Draw_Config:
@@ -38,6 +38,7 @@ class Opening_Books_Config:
     enabled: bool
     priority: int
     read_learn: bool | None
+    write_learn: bool | None
     books: dict[str, Books_Config]
 
 
@@ -89,12 +90,27 @@ class Online_EGTB_Config:
     timeout: int
 
 
+@dataclass
+class Online_Cache_Config:
+    enabled: bool
+    path: str
+    prefetch: bool
+
+
+@dataclass
+class Racing_Config:
+    enabled: bool
+    latency_budget: float
+
+
 @dataclass
 class Online_Moves_Config:
     opening_explorer: Opening_Explorer_Config
     lichess_cloud: Lichess_Cloud_Config
     chessdb: ChessDB_Config
     online_egtb: Online_EGTB_Config
+    cache: Online_Cache_Config
+    racing: Racing_Config
 
 
 @dataclass
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import random
+import ssl
+import statistics
+import time
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60.0
+WARM_UP_INTERVAL = 45.0
+
+
+def create_connector(limit_per_host: int, ssl_context: ssl.SSLContext | bool = True) -> aiohttp.TCPConnector:
+    return aiohttp.TCPConnector(limit=0,
+                                limit_per_host=limit_per_host,
+                                ttl_dns_cache=DNS_CACHE_TTL,
+                                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                                ssl=ssl_context)
+
+
+class Connection_Stats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.queued_connections = 0
+        self.dns_lookups = 0
+        self.dns_cache_hits = 0
+        self.connect_time = 0.0
+        self.last_request_time = 0.0
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._on_request_start)
+        self.trace_config.on_connection_create_start.append(self._on_connection_create_start)
+        self.trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        self.trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        self.trace_config.on_connection_queued_start.append(self._on_connection_queued_start)
+        self.trace_config.on_dns_resolvehost_end.append(self._on_dns_resolvehost_end)
+        self.trace_config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+
+    @property
+    def idle_time(self) -> float:
+        return time.monotonic() - self.last_request_time
+
+    @property
+    def stats_str(self) -> str:
+        connections = self.new_connections + self.reused_connections
+        reuse_rate = self.reused_connections / connections * 100 if connections else 0.0
+        average_connect_time = self.connect_time / self.new_connections if self.new_connections else 0.0
+        return (f'{self.requests} requests     Connections: {self.new_connections} new '
+                f'{self.reused_connections} reused ({reuse_rate:.0f} %) {self.queued_connections} queued     '
+                f'Handshake: {average_connect_time * 1000:.1f} ms avg     '
+                f'DNS: {self.dns_lookups} lookups {self.dns_cache_hits} cached')
+
+    async def _on_request_start(self,
+                                _session: aiohttp.ClientSession,
+                                _context: SimpleNamespace,
+                                _params: aiohttp.TraceRequestStartParams) -> None:
+        self.requests += 1
+        self.last_request_time = time.monotonic()
+
+    async def _on_connection_create_start(self,
+                                          _session: aiohttp.ClientSession,
+                                          context: SimpleNamespace,
+                                          _params: aiohttp.TraceConnectionCreateStartParams) -> None:
+        context.connect_start = time.monotonic()
+
+    async def _on_connection_create_end(self,
+                                        _session: aiohttp.ClientSession,
+                                        context: SimpleNamespace,
+                                        _params: aiohttp.TraceConnectionCreateEndParams) -> None:
+        self.new_connections += 1
+        self.connect_time += time.monotonic() - context.connect_start
+
+    async def _on_connection_reuseconn(self,
+                                       _session: aiohttp.ClientSession,
+                                       _context: SimpleNamespace,
+                                       _params: aiohttp.TraceConnectionReuseconnParams) -> None:
+        self.reused_connections += 1
+
+    async def _on_connection_queued_start(self,
+                                          _session: aiohttp.ClientSession,
+                                          _context: SimpleNamespace,
+                                          _params: aiohttp.TraceConnectionQueuedStartParams) -> None:
+        self.queued_connections += 1
+
+    async def _on_dns_resolvehost_end(self,
+                                      _session: aiohttp.ClientSession,
+                                      _context: SimpleNamespace,
+                                      _params: aiohttp.TraceDnsResolveHostEndParams) -> None:
+        self.dns_lookups += 1
+
+    async def _on_dns_cache_hit(self,
+                                _session: aiohttp.ClientSession,
+                                _context: SimpleNamespace,
+                                _params: aiohttp.TraceDnsCacheHitParams) -> None:
+        self.dns_cache_hits += 1
+
+
+async def _benchmark(requests: int,
+                     min_pause: float,
+                     max_pause: float,
+                     seed: int,
+                     cert: str | None,
+                     key: str | None) -> None:
+    async def handle_move(_request: web.Request) -> web.Response:
+        return web.json_response({'ok': True})
+
+    app = web.Application()
+    app.router.add_post('/api/bot/game/{game_id}/move/{move}', handle_move)
+    server_ssl = None
+    client_ssl: ssl.SSLContext | bool = False
+    if cert and key:
+        server_ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_ssl.load_cert_chain(cert, key)
+        client_ssl = ssl.create_default_context(cafile=cert)
+        client_ssl.check_hostname = False
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0, ssl_context=server_ssl)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f'{"https" if server_ssl else "http"}://127.0.0.1:{port}'
+
+    # Moves are sent after a think of the opponent, so the gaps are drawn from the range of real games.
+    random.seed(seed)
+    pauses = [random.uniform(min_pause, max_pause) for _ in range(requests)]
+
+    async def send_moves(name: str, connector: aiohttp.TCPConnector) -> None:
+        connection_stats = Connection_Stats()
+        async with aiohttp.ClientSession(url, connector=connector,
+                                         trace_configs=[connection_stats.trace_config]) as session:
+            latencies: list[float] = []
+            for index, pause in enumerate(pauses):
+                await asyncio.sleep(pause)
+                start_time = time.perf_counter()
+                async with session.post(f'/api/bot/game/benchmark/move/e2e4{index}') as response:
+                    await response.read()
+                latencies.append(time.perf_counter() - start_time)
+
+        quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        print(f'{name:8} p50: {quantiles[49] * 1000:6.2f} ms     p99: {quantiles[98] * 1000:6.2f} ms     '
+              f'{connection_stats.stats_str}')
+
+    await asyncio.gather(send_moves('default', aiohttp.TCPConnector(ssl=client_ssl)),
+                         send_moves('pooled', create_connector(8, client_ssl)))
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark send_move latency against a local test server.')
+    parser.add_argument('--requests', '-n', default=20, type=int, help='Moves sent per connector.')
+    parser.add_argument('--pause', nargs=2, default=[15.0, 60.0], type=float, metavar=('MIN', 'MAX'),
+                        help='Range of the random seconds between two moves.')
+    parser.add_argument('--seed', default=1, type=int, help='Seed of the random pauses.')
+    parser.add_argument('--cert', type=str, help='Certificate for HTTPS, e.g. a self-signed one.')
+    parser.add_argument('--key', type=str, help='Private key of the certificate.')
+    args = parser.parse_args()
+
+    asyncio.run(_benchmark(args.requests, args.pause[0], args.pause[1], args.seed, args.cert, args.key))
@@ -2,29 +2,60 @@ import asyncio
 import os
 import subprocess
 import sys
+import time
 
 import chess
 import chess.engine
 
 from configs import Engine_Config, Syzygy_Config
 
+PING_TIMEOUT = 2.0
+TIME_LIMIT_GRACE = 5.0
+HUNG_SEARCH_GRACE = 2.0
+
 
 class Engine:
+    total_restarts = 0
+
     def __init__(self,
                  transport: asyncio.SubprocessTransport,
                  engine: chess.engine.UciProtocol,
-                 ponder: bool,
+                 engine_config: Engine_Config,
+                 syzygy_config: Syzygy_Config,
                  opponent: chess.engine.Opponent) -> None:
         self.transport = transport
         self.engine = engine
-        self.ponder = ponder
+        self.engine_config = engine_config
+        self.syzygy_config = syzygy_config
+        self.ponder = engine_config.ponder
         self.opponent = opponent
+        self.restarts = 0
+        self.threads: int | None = None
+        self.hash_size: int | None = None
+        self.ponder_move: chess.Move | None = None
+        self.is_pondering = False
+        self.ponder_ply = 0
+        self.ponder_start_time = 0.0
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        self.ponder_time_saved = 0.0
+        # python-chess cancels the running command with every new one, so commands are sent one at a time.
+        self.lock = asyncio.Lock()
 
     @classmethod
     async def from_config(cls,
                           engine_config: Engine_Config,
                           syzygy_config: Syzygy_Config,
                           opponent: chess.engine.Opponent) -> 'Engine':
+        transport, engine = await cls._start_engine(engine_config, syzygy_config, opponent)
+        return cls(transport, engine, engine_config, syzygy_config, opponent)
+
+    @classmethod
+    async def _start_engine(cls,
+                            engine_config: Engine_Config,
+                            syzygy_config: Syzygy_Config,
+                            opponent: chess.engine.Opponent
+                            ) -> tuple[asyncio.SubprocessTransport, chess.engine.UciProtocol]:
         stderr = subprocess.DEVNULL if engine_config.silence_stderr else None
 
         transport, engine = await chess.engine.popen_uci(engine_config.path, stderr=stderr)
@@ -32,7 +63,7 @@ class Engine:
         await cls._configure_engine(engine, engine_config, syzygy_config)
         await engine.send_opponent_information(opponent=opponent)
 
-        return cls(transport, engine, engine_config.ponder, opponent)
+        return transport, engine
 
     @classmethod
     async def test(cls, engine_config: Engine_Config) -> None:
@@ -80,40 +111,188 @@ class Engine:
     def name(self) -> str:
         return self.engine.id['name']
 
+    @property
+    def ponder_str(self) -> str | None:
+        ponder_count = self.ponder_hits + self.ponder_misses
+        if not ponder_count:
+            return
+
+        hit_rate = self.ponder_hits / ponder_count * 100.0
+        return (f'Ponder hits: {self.ponder_hits}/{ponder_count} ({hit_rate:.0f} %)     '
+                f'Saved: {self.ponder_time_saved:.1f} s')
+
     async def make_move(self,
                         board: chess.Board,
                         white_time: float,
                         black_time: float,
                         increment: float
                         ) -> tuple[chess.Move, chess.engine.InfoDict]:
+        async with self.lock:
+            ponder = self.ponder and len(board.move_stack) >= 2
+            start_time = time.perf_counter()
+
+            ponder_hit = self._check_ponderhit(board)
+            self.is_pondering = False
+            try:
+                result = await self._play(board, self._get_limit(board, white_time, black_time, increment), ponder)
+            except (chess.engine.EngineError, TimeoutError) as e:
+                print(f'Engine failed: {e!r}')
+                await self._restart()
+
+                if board.turn:
+                    white_time = max(white_time - (time.perf_counter() - start_time), 0.05)
+                else:
+                    black_time = max(black_time - (time.perf_counter() - start_time), 0.05)
+
+                result = await self._play(board, self._get_limit(board, white_time, black_time, increment), ponder)
+
+            if not result.move:
+                raise RuntimeError('Engine could not make a move!')
+
+            # Searches cancelled by a racing online source do not reach this point and are not counted.
+            if ponder_hit:
+                self.ponder_hits += 1
+                self.ponder_time_saved += start_time - self.ponder_start_time
+            elif ponder_hit is not None:
+                self.ponder_misses += 1
+
+            if ponder and result.ponder:
+                self.ponder_move = result.ponder
+                self.is_pondering = True
+                self.ponder_ply = len(board.move_stack) + 2
+                self.ponder_start_time = time.perf_counter()
+
+            return result.move, result.info
+
+    def _get_limit(self,
+                   board: chess.Board,
+                   white_time: float,
+                   black_time: float,
+                   increment: float) -> chess.engine.Limit:
         if len(board.move_stack) < 2:
-            limit = chess.engine.Limit(time=15.0) if self.opponent.is_engine else chess.engine.Limit(time=5.0)
-            ponder = False
+            return chess.engine.Limit(time=15.0) if self.opponent.is_engine else chess.engine.Limit(time=5.0)
+
+        return chess.engine.Limit(white_clock=white_time, white_inc=increment,
+                                  black_clock=black_time, black_inc=increment)
+
+    async def _play(self, board: chess.Board, limit: chess.engine.Limit, ponder: bool) -> chess.engine.PlayResult:
+        if limit.time is not None:
+            deadline = limit.time + TIME_LIMIT_GRACE
+            grace_margin = HUNG_SEARCH_GRACE
         else:
-            limit = chess.engine.Limit(white_clock=white_time, white_inc=increment,
-                                       black_clock=black_time, black_inc=increment)
-            ponder = self.ponder
+            clock = limit.white_clock if board.turn else limit.black_clock
+            assert clock is not None
+            deadline = clock / 4 + (limit.white_inc or 0.0)
+            grace_margin = min(max(clock / 10, 0.1), HUNG_SEARCH_GRACE)
 
-        result = await self.engine.play(board, limit, info=chess.engine.INFO_ALL, ponder=ponder)
+        play_task = asyncio.create_task(self.engine.play(board, limit, info=chess.engine.INFO_ALL, ponder=ponder))
+        try:
+            # A search still running after its deadline and the grace margin is treated as hung.
+            # No isready is sent to check, python-chess would cancel the running search for it.
+            done, _ = await asyncio.wait({play_task}, timeout=deadline + grace_margin)
+            if not done:
+                raise TimeoutError(f'Engine did not answer within {deadline + grace_margin:.1f} seconds.')
 
-        if not result.move:
-            raise RuntimeError('Engine could not make a move!')
+            return await play_task
+        finally:
+            if not play_task.done():
+                play_task.cancel()
 
-        return result.move, result.info
+    async def _restart(self) -> None:
+        self.restarts += 1
+        Engine.total_restarts += 1
+        print(f'Restarting engine ... ({self.restarts} in this game, {Engine.total_restarts} in total)')
+
+        self.transport.close()
+        self.transport, self.engine = await self._start_engine(self.engine_config, self.syzygy_config, self.opponent)
+        self.ponder_move = None
+        self.is_pondering = False
+
+        threads, hash_size = self.threads, self.hash_size
+        self.threads = None
+        self.hash_size = None
+        await self._set_resources(threads, hash_size)
+
+    def _check_ponderhit(self, board: chess.Board) -> bool | None:
+        if self.ponder_move is None:
+            return
+
+        ponder_hit = len(board.move_stack) == self.ponder_ply and board.peek() == self.ponder_move
+        self.ponder_move = None
+        return ponder_hit
+
+    async def set_resources(self, threads: int | None, hash_size: int | None) -> None:
+        async with self.lock:
+            try:
+                await self._set_resources(threads, hash_size)
+            except chess.engine.EngineTerminatedError:
+                await self._restart()
+
+    async def _set_resources(self, threads: int | None, hash_size: int | None) -> None:
+        options: dict[str, int] = {}
+
+        if threads is not None and threads != self.threads and 'Threads' in self.engine.options:
+            option = self.engine.options['Threads']
+            options['Threads'] = self._clamp(threads, option.min, option.max)
+
+        if hash_size is not None and hash_size != self.hash_size and 'Hash' in self.engine.options:
+            option = self.engine.options['Hash']
+            options['Hash'] = self._clamp(hash_size, option.min, option.max)
+
+        if not options:
+            return
+
+        self.ponder_move = None
+        self.is_pondering = False
+        await self.engine.configure(options)
+        self.threads = threads if 'Threads' in options else self.threads
+        self.hash_size = hash_size if 'Hash' in options else self.hash_size
+
+    @staticmethod
+    def _clamp(value: int, min_value: int | None, max_value: int | None) -> int:
+        if min_value is not None:
+            value = max(value, min_value)
+
+        if max_value is not None:
+            value = min(value, max_value)
+
+        return value
 
     async def start_pondering(self, board: chess.Board) -> None:
-        if self.ponder:
-            await self.engine.analysis(board)
+        async with self.lock:
+            if self.ponder:
+                self.ponder_move = None
+                try:
+                    await self.engine.analysis(board)
+                    self.is_pondering = True
+                except chess.engine.EngineTerminatedError:
+                    await self._restart()
+
+    async def stop_pondering(self) -> None:
+        async with self.lock:
+            if self.ponder:
+                self.ponder = False
+                await self._interrupt_pondering()
 
-    async def stop_pondering(self, board: chess.Board) -> None:
-        if self.ponder:
-            self.ponder = False
-            await self.engine.analysis(board, chess.engine.Limit(time=0.001))
+    async def pause_pondering(self) -> None:
+        # Unlike stop_pondering the engine ponders again after its next move.
+        async with self.lock:
+            if self.is_pondering:
+                await self._interrupt_pondering()
+
+    async def _interrupt_pondering(self) -> None:
+        self.ponder_move = None
+        self.is_pondering = False
+        try:
+            await asyncio.wait_for(self.engine.ping(), PING_TIMEOUT)
+        except (chess.engine.EngineError, TimeoutError):
+            await self._restart()
 
     async def close(self) -> None:
+        self.is_pondering = False
         try:
             await asyncio.wait_for(self.engine.quit(), 5.0)
-        except TimeoutError:
+        except (chess.engine.EngineError, TimeoutError):
             print('Engine could not be terminated cleanly.')
 
         self.transport.close()
@@ -21,6 +21,16 @@ class Decline_Reason(StrEnum):
     ONLY_BOT = 'onlyBot'
 
 
+class Request_Class(StrEnum):
+    MOVE = 'move'
+    GAME = 'game'
+    CHALLENGE = 'challenge'
+    STATUS = 'status'
+    OTHER = 'other'
+    CLOUD_EVAL = 'cloud_eval'
+    CHAT = 'chat'
+
+
 class Variant(StrEnum):
     STANDARD = 'standard'
     FROM_POSITION = 'fromPosition'
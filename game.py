@@ -2,37 +2,69 @@ import asyncio
 from typing import Any
 
 from api import API
+from book_registry import Book_Registry
 from botli_dataclasses import Game_Information
+from chat_outbox import Chat_Outbox
 from chatter import Chatter
 from config import Config
+from game_stream_manager import Game_Stream, Game_Stream_Manager
 from lichess_game import Lichess_Game
+from position_cache import Position_Cache
+from resource_governor import Resource_Governor
+from single_flight import Single_Flight
+from tablebase_registry import Tablebase_Registry
 
 
 class Game:
-    def __init__(self, api: API, config: Config, username: str, game_id: str) -> None:
+    def __init__(self,
+                 api: API,
+                 config: Config,
+                 username: str,
+                 game_id: str,
+                 resource_governor: Resource_Governor,
+                 position_cache: Position_Cache,
+                 single_flight: Single_Flight,
+                 book_registry: Book_Registry,
+                 tablebase_registry: Tablebase_Registry,
+                 game_stream_manager: Game_Stream_Manager,
+                 chat_outbox: Chat_Outbox) -> None:
         self.api = api
         self.config = config
         self.username = username
         self.game_id = game_id
+        self.resource_governor = resource_governor
+        self.position_cache = position_cache
+        self.single_flight = single_flight
+        self.book_registry = book_registry
+        self.tablebase_registry = tablebase_registry
+        self.game_stream_manager = game_stream_manager
+        self.chat_outbox = chat_outbox
         self.was_aborted = False
         self.move_task: asyncio.Task[None] | None = None
 
     async def run(self) -> None:
-        game_stream_queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
-        asyncio.create_task(self.api.get_game_stream(self.game_id, game_stream_queue))
-        info = Game_Information.from_gameFull_event(await game_stream_queue.get())
-        lichess_game = await Lichess_Game.acreate(self.api, self.config, self.username, info)
-        chatter = Chatter(self.api, self.config, self.username, info, lichess_game)
+        game_stream = self.game_stream_manager.open(self.game_id)
+        try:
+            await self._run(game_stream)
+        finally:
+            self.game_stream_manager.close(self.game_id)
+
+    async def _run(self, game_stream: Game_Stream) -> None:
+        info = Game_Information.from_gameFull_event(await game_stream.get())
+        lichess_game = await Lichess_Game.acreate(self.api, self.config, self.username, info,
+                                                  self.resource_governor, self.position_cache, self.single_flight,
+                                                  self.book_registry, self.tablebase_registry)
+        chatter = Chatter(self.chat_outbox, self.config, self.username, info, lichess_game)
 
         self._print_game_information(info)
 
         if info.state['status'] != 'started':
             self._print_result_message(info.state, lichess_game, info)
-            await chatter.send_goodbyes()
+            chatter.send_goodbyes()
             await lichess_game.close()
             return
 
-        await chatter.send_greetings()
+        chatter.send_greetings()
 
         if lichess_game.is_our_turn:
             await self._make_move(lichess_game, chatter)
@@ -43,10 +75,10 @@ class Game:
         abortion_seconds = 30 if opponent_title == 'BOT' else 60
         abortion_task = asyncio.create_task(self._abortion_task(lichess_game, chatter, abortion_seconds))
 
-        while event := await game_stream_queue.get():
+        while event := await game_stream.get():
             match event['type']:
                 case 'chatLine':
-                    await chatter.handle_chat_message(event)
+                    chatter.handle_chat_message(event)
                     continue
                 case 'opponentGone':
                     if event.get('claimWinInSeconds') == 0:
@@ -55,14 +87,15 @@ class Game:
                 case 'gameFull':
                     event = event['state']
 
-            lichess_game.update(event)
+            await lichess_game.update(event)
 
             if event['status'] != 'started':
                 if self.move_task:
                     self.move_task.cancel()
 
                 self._print_result_message(event, lichess_game, info)
-                await chatter.send_goodbyes()
+                await lichess_game.learn_from_result(event)
+                chatter.send_goodbyes()
                 break
 
             if lichess_game.is_our_turn and not lichess_game.board.is_repetition():
@@ -77,8 +110,9 @@ class Game:
         if lichess_move.resign:
             await self.api.resign_game(self.game_id)
         else:
-            await self.api.send_move(self.game_id, lichess_move.uci_move, lichess_move.offer_draw)
-            await chatter.print_eval()
+            if await self.api.send_move(self.game_id, lichess_move.uci_move, lichess_move.offer_draw):
+                self.game_stream_manager.expect_event(self.game_id, len(lichess_game.board.move_stack))
+            chatter.print_eval()
         self.move_task = None
 
     async def _abortion_task(self, lichess_game: Lichess_Game, chatter: Chatter, abortion_seconds: int) -> None:
@@ -87,7 +121,7 @@ class Game:
         if not lichess_game.is_our_turn and lichess_game.is_abortable:
             print('Aborting game ...')
             await self.api.abort_game(self.game_id)
-            await chatter.send_abortion_message()
+            chatter.send_abortion_message()
 
     def _print_game_information(self, info: Game_Information) -> None:
         opponents_str = f'{info.white_str}   -   {info.black_str}'
@@ -152,6 +186,7 @@ class Game:
                 black_result = 'X'
 
         opponents_str = f'{info.white_str} {white_result} - {black_result} {info.black_str}'
-        message = (5 * ' ').join([info.id_str, opponents_str, message])
+        message = (5 * ' ').join(filter(None, [info.id_str, opponents_str, message,
+                                               lichess_game.engine.ponder_str, lichess_game.cache_str]))
 
         print(f'{message}\n{128 * "‾"}')
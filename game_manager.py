@@ -4,11 +4,19 @@ from collections import deque
 from typing import Any
 
 from api import API
+from book_registry import Book_Registry
 from botli_dataclasses import Challenge, Challenge_Request, Tournament, Tournament_Request
 from challenger import Challenger
+from chat_outbox import Chat_Outbox
 from config import Config
 from game import Game
+from game_stream_manager import Game_Stream_Manager
+from loop_lag_monitor import Loop_Lag_Monitor
 from matchmaking import Matchmaking
+from position_cache import Position_Cache
+from resource_governor import Resource_Governor
+from single_flight import Single_Flight
+from tablebase_registry import Tablebase_Registry
 
 
 class Game_Manager:
@@ -17,9 +25,17 @@ class Game_Manager:
         self.config = config
         self.username = username
 
+        self.book_registry = Book_Registry()
         self.challenger = Challenger(api)
         self.changed_event = Event()
+        self.chat_outbox = Chat_Outbox(api)
+        self.game_stream_manager = Game_Stream_Manager(api)
+        self.loop_lag_monitor = Loop_Lag_Monitor()
         self.matchmaking = Matchmaking(api, config, username)
+        self.resource_governor = Resource_Governor()
+        self.position_cache = Position_Cache(config.online_moves.cache)
+        self.single_flight = Single_Flight()
+        self.tablebase_registry = Tablebase_Registry()
 
         self.challenge_requests: deque[Challenge_Request] = deque()
         self.current_matchmaking_game_id: str | None = None
@@ -42,6 +58,7 @@ class Game_Manager:
         self.changed_event.set()
 
     async def run(self) -> None:
+        self.loop_lag_monitor.start()
         while self.is_running:
             try:
                 async with asyncio.timeout_at(self.next_matchmaking):
@@ -80,6 +97,11 @@ class Game_Manager:
         for task in list(self.tasks):
             await task
 
+        await self.chat_outbox.close()
+        self.loop_lag_monitor.stop()
+        await self.position_cache.close()
+        self.tablebase_registry.close()
+
     @property
     def is_busy(self) -> bool:
         return len(self.tasks) + len(self.tournaments) + self.reserved_game_spots >= self.config.challenge.concurrency
@@ -227,7 +249,9 @@ class Game_Manager:
             self.tournaments[tournament.id_] = tournament
             print(f'External joined tournament "{tournament.name}" detected.')
 
-        game = Game(self.api, self.config, self.username, game_event['id'])
+        game = Game(self.api, self.config, self.username, game_event['id'], self.resource_governor,
+                    self.position_cache, self.single_flight, self.book_registry, self.tablebase_registry,
+                    self.game_stream_manager, self.chat_outbox)
         task = asyncio.create_task(game.run())
         task.add_done_callback(self._task_callback)
         self.tasks[task] = game
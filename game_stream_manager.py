@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any
+
+import aiohttp
+
+from api import API
+
+logger = logging.getLogger(__name__)
+MAX_QUEUED_EVENTS = 64
+RECONNECT_DELAY = 1.0
+KEEP_ALIVE_INTERVAL = 7.0
+STALL_FACTOR = 1.25
+ECHO_TIMEOUT = 2.0
+
+
+class Game_Stream:
+    def __init__(self, game_id: str) -> None:
+        self.game_id = game_id
+        self.queue: asyncio.Queue[tuple[float, dict[str, Any]]] = asyncio.Queue(MAX_QUEUED_EVENTS)
+        self.lines: asyncio.Queue[tuple[int, float, dict[str, Any] | None, bool]] = asyncio.Queue(MAX_QUEUED_EVENTS)
+        self.task: asyncio.Task[None] | None = None
+        self.start_time = time.monotonic()
+        self.messages = 0
+        self.reconnects = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.last_line_time = time.monotonic()
+        self.keep_alive_gaps: deque[float] = deque(maxlen=8)
+        self.echo_deadline: float | None = None
+        self.last_state: dict[str, Any] | None = None
+        self.stall_time = 0.0
+        self.max_gap = 0.0
+        self.stalls = 0
+        self.failovers = 0
+        self.false_alarms = 0
+        self.failover_time = 0.0
+        self.duplicates = 0
+
+    async def get(self) -> dict[str, Any]:
+        receive_time, event = await self.queue.get()
+        lag = time.monotonic() - receive_time
+        self.messages += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        return event
+
+    def expect_event(self, moves: int) -> None:
+        # The echo of the move can arrive before the response to the move request.
+        if self.last_state is None or len(self.last_state['moves'].split()) < moves:
+            self.echo_deadline = time.monotonic() + ECHO_TIMEOUT
+
+    @property
+    def stall_deadline(self) -> float:
+        keep_alive_interval = max(self.keep_alive_gaps) if self.keep_alive_gaps else KEEP_ALIVE_INTERVAL
+        deadline = self.last_line_time + keep_alive_interval * STALL_FACTOR
+        if self.echo_deadline is not None:
+            return min(deadline, self.echo_deadline)
+
+        return deadline
+
+    def record_line(self, receive_time: float, event: dict[str, Any] | None) -> None:
+        gap = receive_time - self.last_line_time
+        self.last_line_time = receive_time
+        self.max_gap = max(self.max_gap, gap)
+
+        if event is None:
+            self.keep_alive_gaps.append(gap)
+        else:
+            self.echo_deadline = None
+
+    def is_duplicate(self, event: dict[str, Any]) -> bool:
+        match event['type']:
+            case 'gameFull':
+                state = event['state']
+            case 'gameState':
+                state = event
+            case _:
+                return False
+
+        # A new connection starts with gameFull and the old one may still deliver stale states.
+        state = {key: value for key, value in state.items() if key not in ('type', 'wtime', 'btime')}
+        if self.last_state is not None:
+            if state == self.last_state or len(state['moves'].split()) < len(self.last_state['moves'].split()):
+                self.duplicates += 1
+                return True
+
+        self.last_state = state
+        return False
+
+    @property
+    def stats_str(self) -> str:
+        duration = max(time.monotonic() - self.start_time, 1e-9)
+        average_lag = self.total_lag / self.messages if self.messages else 0.0
+        average_failover_time = self.failover_time / self.failovers if self.failovers else 0.0
+        return (f'{self.game_id}: {self.messages} messages ({self.messages / duration:.2f}/s)     '
+                f'Lag: {average_lag * 1000:.1f} ms avg {self.max_lag * 1000:.1f} ms max     '
+                f'Queued: {self.queue.qsize()}     Reconnects: {self.reconnects}     '
+                f'Stalls: {self.stalls} ({self.failovers} failovers {self.false_alarms} false alarms, '
+                f'{average_failover_time * 1000:.0f} ms avg)     Duplicates: {self.duplicates}     '
+                f'Max gap: {self.max_gap:.1f} s')
+
+
+class Game_Stream_Manager:
+    def __init__(self, api: API) -> None:
+        self.api = api
+        self.streams: dict[str, Game_Stream] = {}
+
+    def open(self, game_id: str) -> Game_Stream:
+        self.close(game_id)
+
+        game_stream = Game_Stream(game_id)
+        game_stream.task = asyncio.create_task(self._run(game_stream))
+        self.streams[game_id] = game_stream
+        return game_stream
+
+    def close(self, game_id: str) -> None:
+        if game_stream := self.streams.pop(game_id, None):
+            if game_stream.task:
+                game_stream.task.cancel()
+
+    def expect_event(self, game_id: str, moves: int) -> None:
+        if game_stream := self.streams.get(game_id):
+            game_stream.expect_event(moves)
+
+    async def _run(self, game_stream: Game_Stream) -> None:
+        connections: dict[int, asyncio.Task[None]] = {}
+        connection_id = 0
+        try:
+            while True:
+                if not connections:
+                    if connection_id:
+                        game_stream.reconnects += 1
+                        await asyncio.sleep(RECONNECT_DELAY)
+
+                    connection_id += 1
+                    connections[connection_id] = asyncio.create_task(self._read(game_stream, connection_id))
+                    game_stream.last_line_time = time.monotonic()
+
+                # While a replacement is being opened, both connections wait for their socket read timeout.
+                timeout = game_stream.stall_deadline - time.monotonic() if len(connections) == 1 else None
+                try:
+                    async with asyncio.timeout(max(timeout, 0.0) if timeout is not None else None):
+                        line_connection_id, receive_time, event, is_closed = await game_stream.lines.get()
+                except TimeoutError:
+                    game_stream.stalls += 1
+                    game_stream.stall_time = time.monotonic()
+                    game_stream.echo_deadline = None
+                    logger.debug('Game stream %s stalled, opening a replacement.', game_stream.game_id)
+                    connection_id += 1
+                    connections[connection_id] = asyncio.create_task(self._read(game_stream, connection_id))
+                    game_stream.last_line_time = time.monotonic()
+                    continue
+
+                if line_connection_id not in connections:
+                    continue
+
+                if is_closed:
+                    del connections[line_connection_id]
+                    continue
+
+                if len(connections) > 1:
+                    # The first connection to deliver a line after a suspected stall is kept.
+                    for other_connection_id in [other for other in connections if other != line_connection_id]:
+                        connections.pop(other_connection_id).cancel()
+
+                    if line_connection_id == connection_id:
+                        game_stream.failovers += 1
+                        game_stream.failover_time += receive_time - game_stream.stall_time
+                    else:
+                        game_stream.false_alarms += 1
+
+                game_stream.record_line(receive_time, event)
+                if event is None or game_stream.is_duplicate(event):
+                    continue
+
+                await game_stream.queue.put((receive_time, event))
+        finally:
+            for connection in connections.values():
+                connection.cancel()
+
+    async def _read(self, game_stream: Game_Stream, connection_id: int) -> None:
+        try:
+            async for event in self.api.get_game_stream(game_stream.game_id):
+                await game_stream.lines.put((connection_id, time.monotonic(), event, False))
+        except (aiohttp.ClientError, json.JSONDecodeError, TimeoutError) as e:
+            logger.debug('Game stream %s failed: %r', game_stream.game_id, e)
+
+        await game_stream.lines.put((connection_id, time.monotonic(), None, True))
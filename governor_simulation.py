@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import contextlib
+import random
+import selectors
+import statistics
+
+from resource_governor import Resource_Governor
+
+
+class Virtual_Time_Selector(selectors.DefaultSelector):
+    def __init__(self) -> None:
+        super().__init__()
+        self.time = 0.0
+
+    def select(self, timeout: float | None = None) -> list[tuple[selectors.SelectorKey, int]]:
+        # Instead of sleeping, the simulation jumps straight to the next timer.
+        events = super().select(0)
+        if not events and timeout:
+            self.time += timeout
+
+        return events
+
+
+class Virtual_Time_Loop(asyncio.SelectorEventLoop):
+    def __init__(self) -> None:
+        self.selector = Virtual_Time_Selector()
+        super().__init__(self.selector)
+
+    def time(self) -> float:
+        return self.selector.time
+
+
+class Simulated_CPU:
+    def __init__(self, cores: int) -> None:
+        self.cores = cores
+        self.load = 0
+
+    async def run(self, threads: int, work: float) -> None:
+        # The search needs its move time at full speed, more threads than cores slow all searches down.
+        self.load += threads
+        try:
+            while work > 0.0:
+                await asyncio.sleep(0.05)
+                work -= 0.05 * min(self.cores / self.load, 1.0)
+        finally:
+            self.load -= threads
+
+    async def ponder(self, threads: int, duration: float, stopped: asyncio.Event) -> None:
+        self.load += threads
+        try:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(stopped.wait(), duration)
+        finally:
+            self.load -= threads
+
+
+async def _simulate_game(governor: Resource_Governor | None,
+                         cpu: Simulated_CPU,
+                         game_id: str,
+                         time_control: tuple[float, float],
+                         moves: int,
+                         ponder: bool,
+                         move_times: list[float]) -> bool:
+    loop = asyncio.get_running_loop()
+    initial, increment = time_control
+    own_time = initial
+    for _ in range(moves):
+        opponent_time = random.uniform(0.5, 1.5) * initial / 40
+        if ponder:
+            # The governor may stop the ponder early for the search of another game.
+            stopped = asyncio.Event()
+            if governor:
+                governor.set_pondering(game_id, 1, stopped.set)
+            await asyncio.gather(cpu.ponder(1, opponent_time, stopped), asyncio.sleep(opponent_time))
+        else:
+            await asyncio.sleep(opponent_time)
+
+        start_time = loop.time()
+        if governor:
+            async with governor.reserve(game_id, 1, own_time, increment):
+                await cpu.run(1, (own_time - (loop.time() - start_time)) / 30 + increment)
+        else:
+            await cpu.run(1, own_time / 30 + increment)
+
+        move_time = loop.time() - start_time
+        move_times.append(move_time)
+        own_time -= move_time
+        if own_time <= 0.0:
+            return False
+
+        own_time += increment
+
+    return True
+
+
+async def _simulate(cores: int,
+                    games: dict[str, tuple[int, float, float]],
+                    moves: int,
+                    ponder: bool,
+                    use_governor: bool,
+                    seed: int) -> None:
+    random.seed(seed)
+    cpu = Simulated_CPU(cores)
+    governor = Resource_Governor() if use_governor else None
+    if governor:
+        governor.cores = cores
+
+    tasks: dict[str, list[asyncio.Task[bool]]] = {name: [] for name in games}
+    move_times: dict[str, list[float]] = {name: [] for name in games}
+    for name, (game_count, initial, increment) in games.items():
+        for index in range(game_count):
+            tasks[name].append(asyncio.create_task(_simulate_game(governor, cpu, f'{name}{index}',
+                                                                  (initial, increment), moves, ponder,
+                                                                  move_times[name])))
+
+    for name, game_tasks in tasks.items():
+        if not game_tasks:
+            continue
+
+        results = [await task for task in game_tasks]
+        quantiles = statistics.quantiles(move_times[name], n=100, method='inclusive')
+        mode = 'queue' if use_governor else 'no queue'
+        print(f'{mode:9} {name:7} {results.count(False):3}/{len(results)} flagged     '
+              f'Move time p50: {quantiles[49]:5.2f} s p90: {quantiles[89]:5.2f} s')
+
+
+def _benchmark(cores: int, game_counts: list[int], moves: int, ponder: bool, seed: int) -> None:
+    time_controls = [('bullet', 60.0, 0.0), ('blitz', 180.0, 2.0), ('rapid', 600.0, 5.0)]
+    games = {name: (game_count, initial, increment)
+             for (name, initial, increment), game_count in zip(time_controls, game_counts)}
+    print(f'{cores} cores, {sum(game_counts)} games, {moves} moves each, pondering {"on" if ponder else "off"}')
+    for use_governor in (False, True):
+        loop = Virtual_Time_Loop()
+        try:
+            loop.run_until_complete(_simulate(cores, games, moves, ponder, use_governor, seed))
+        finally:
+            loop.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate overloaded engine searches with and without the queue.')
+    parser.add_argument('--cores', '-c', default=6, type=int, help='Simulated cores.')
+    parser.add_argument('--games', '-g', nargs=3, default=[6, 6, 6], type=int,
+                        help='Bullet (1+0), blitz (3+2) and rapid (10+5) games.')
+    parser.add_argument('--moves', '-m', default=40, type=int, help='Moves per game.')
+    parser.add_argument('--no-ponder', action='store_true', help='Engines do not ponder on the opponent\'s time.')
+    parser.add_argument('--seed', default=1, type=int, help='Seed of the simulated opponent think times.')
+    args = parser.parse_args()
+
+    _benchmark(args.cores, args.games, args.moves, not args.no_ponder, args.seed)
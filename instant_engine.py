@@ -0,0 +1,47 @@
+import random
+import sys
+
+import chess
+
+# UCI engine for the stand-in benchmark. It answers every search at once, so the benchmark measures the bot and not
+# the engine. It only imports python-chess, as every game of a benchmark starts its own copy.
+
+
+def main() -> None:
+    board = chess.Board()
+    ponder_move: str | None = None
+    for line in sys.stdin:
+        command, *tokens = line.split() or ['']
+        if command == 'uci':
+            print('id name Instant Engine\noption name Ponder type check default false\nuciok', flush=True)
+        elif command == 'isready':
+            print('readyok', flush=True)
+        elif command == 'position':
+            moves = tokens[tokens.index('moves') + 1:] if 'moves' in tokens else []
+            board = chess.Board() if tokens[0] == 'startpos' else chess.Board(' '.join(tokens[1:7]))
+            for move in moves:
+                board.push_uci(move)
+        elif command == 'go':
+            legal_moves = list(board.legal_moves)
+            if not legal_moves:
+                print('bestmove 0000', flush=True)
+                continue
+
+            move = random.choice(legal_moves)
+            board.push(move)
+            replies = list(board.legal_moves)
+            bestmove = f'bestmove {move.uci()}' + (f' ponder {random.choice(replies).uci()}' if replies else '')
+            print(f'info depth 1 score cp 0 nodes 1 pv {move.uci()}', flush=True)
+            if 'ponder' in tokens:
+                ponder_move = bestmove
+            else:
+                print(bestmove, flush=True)
+        elif command in ('stop', 'ponderhit') and ponder_move:
+            print(ponder_move, flush=True)
+            ponder_move = None
+        elif command == 'quit':
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+from collections import deque
+
+MIN_SAMPLES = 5
+PERCENTILE = 0.95
+SAFETY_FACTOR = 1.5
+MIN_MOVE_OVERHEAD = 0.1
+
+
+class Lag_Estimator:
+    process_samples: deque[float] = deque(maxlen=500)
+
+    def __init__(self, max_move_overhead: float, multiplier: float) -> None:
+        self.max_move_overhead = max_move_overhead
+        self.multiplier = multiplier
+        self.samples: deque[float] = deque(maxlen=50)
+
+    def add_sample(self, lag: float) -> None:
+        lag = max(lag, 0.0)
+        self.samples.append(lag)
+        Lag_Estimator.process_samples.append(lag)
+
+    @property
+    def move_overhead(self) -> float:
+        samples = self.samples if len(self.samples) >= MIN_SAMPLES else Lag_Estimator.process_samples
+        if len(samples) < MIN_SAMPLES:
+            return self.max_move_overhead
+
+        sorted_samples = sorted(samples)
+        lag = sorted_samples[min(int(len(sorted_samples) * PERCENTILE), len(sorted_samples) - 1)]
+        move_overhead = max(lag * SAFETY_FACTOR * self.multiplier, MIN_MOVE_OVERHEAD)
+
+        return min(move_overhead, self.max_move_overhead)
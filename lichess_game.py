@@ -1,7 +1,9 @@
+import asyncio
 import random
 import struct
 import time
-from collections.abc import Awaitable, Callable, Iterable
+from collections import Counter
+from collections.abc import Awaitable, Callable, Hashable, Iterable
 from itertools import islice
 from typing import Any, Literal
 
@@ -10,15 +12,28 @@ import chess.engine
 import chess.gaviota
 import chess.polyglot
 import chess.syzygy
-from chess.variant import find_variant
+from chess.variant import CrazyhouseBoard, ThreeCheckBoard, find_variant
 
 from api import API
+from book_registry import Book_Registry
 from botli_dataclasses import (Book_Settings, Game_Information, Gaviota_Result, Lichess_Move, Move_Response,
                                Syzygy_Result)
+from circuit_breaker import Circuit_Breaker
 from config import Config
 from configs import Engine_Config, Syzygy_Config
 from engine import Engine
-from enums import Variant
+from enums import Request_Class, Variant
+from lag_estimator import Lag_Estimator
+from position_cache import Position_Cache
+from resource_governor import Resource_Governor
+from single_flight import Single_Flight
+from tablebase_registry import Tablebase_Registry
+
+MAX_PREFETCH_REPLIES = 2
+# Online sources whose requests are paid from a lichess request budget.
+BUDGETED_SOURCES = {'lichess_cloud': Request_Class.CLOUD_EVAL}
+
+Online_Request = Callable[[], Awaitable[dict[str, Any] | None]]
 
 
 class Lichess_Game:
@@ -30,11 +45,23 @@ class Lichess_Game:
                  board: chess.Board,
                  syzygy_config: Syzygy_Config,
                  engine_key: str,
-                 engine: Engine) -> None:
+                 engine: Engine,
+                 resource_governor: Resource_Governor,
+                 position_cache: Position_Cache,
+                 single_flight: Single_Flight,
+                 book_registry: Book_Registry,
+                 tablebase_registry: Tablebase_Registry) -> None:
         self.api = api
         self.config = config
+        self.engine_config = config.engines[engine_key]
+        self.resource_governor = resource_governor
+        self.position_cache = position_cache
+        self.single_flight = single_flight
+        self.book_registry = book_registry
+        self.tablebase_registry = tablebase_registry
         self.game_info = game_info
         self.board = board
+        self.position_counts = self._get_position_counts(board)
         self.syzygy_config = syzygy_config
         self.white_time: float = self.game_info.state['wtime'] / 1000
         self.black_time: float = self.game_info.state['btime'] / 1000
@@ -51,14 +78,34 @@ class Lichess_Game:
         self.out_of_cloud_counter = 0
         self.chessdb_counter = 0
         self.out_of_chessdb_counter = 0
-        self.move_overhead = self._get_move_overhead(config.engines[engine_key])
+        self.cache_lookups = 0
+        self.cache_hits = 0
+        self.cache_time_saved = 0.0
+        self.prefetch_count = 0
+        self.prefetch_task: asyncio.Task[None] | None = None
+        self.pause_pondering_task: asyncio.Task[None] | None = None
+        self.is_racing = False
+        self.lag_estimator = self._get_lag_estimator(self.engine_config)
+        self.turn_start_time = time.perf_counter()
+        self.turn_start_clock = self.own_time
+        self.move_end_time: float | None = None
         self.engine = engine
         self.scores: list[chess.engine.PovScore] = []
         self.last_message = 'No eval available yet.'
         self.last_pv: list[chess.Move] = []
+        self.book_entries: list[tuple[str, chess.polyglot.Entry]] = []
 
     @classmethod
-    async def acreate(cls, api: API, config: Config, username: str, game_info: Game_Information) -> 'Lichess_Game':
+    async def acreate(cls,
+                      api: API,
+                      config: Config,
+                      username: str,
+                      game_info: Game_Information,
+                      resource_governor: Resource_Governor,
+                      position_cache: Position_Cache,
+                      single_flight: Single_Flight,
+                      book_registry: Book_Registry,
+                      tablebase_registry: Tablebase_Registry) -> 'Lichess_Game':
         board = cls._get_board(game_info)
         is_white = game_info.white_name == username
         engine_key = cls._get_engine_key(config, board, is_white, game_info)
@@ -66,7 +113,13 @@ class Lichess_Game:
         engine = await Engine.from_config(config.engines[engine_key],
                                           syzygy_config,
                                           game_info.black_opponent if is_white else game_info.white_opponent)
-        return cls(api, config, username, game_info, board, syzygy_config, engine_key, engine)
+        resource_governor.register(game_info.id_, game_info.speed)
+        lichess_game = cls(api, config, username, game_info, board, syzygy_config, engine_key, engine,
+                           resource_governor, position_cache, single_flight, book_registry, tablebase_registry)
+        for path in lichess_game.book_settings.paths.values():
+            await book_registry.acquire(path)
+        await lichess_game.update_engine_resources()
+        return lichess_game
 
     @staticmethod
     def _get_board(game_info: Game_Information) -> chess.Board:
@@ -137,38 +190,89 @@ class Lichess_Game:
                 return Syzygy_Config(False, [], 0, False)
 
     async def make_move(self) -> Lichess_Move:
-        for move_source in self.move_sources:
-            if move_response := await move_source():
-                break
+        if self.config.online_moves.racing.enabled and self.move_sources:
+            move_response = await self._race_move_sources()
         else:
-            move, info = await self.engine.make_move(self.board, *self.engine_times)
+            for move_source in self.move_sources:
+                if move_response := await move_source():
+                    break
+            else:
+                move_response = await self._make_engine_move()
 
-            if 'score' in info:
-                self.scores.append(info['score'])
-            message = f'Engine:  {self._format_move(move):14} {self._format_engine_info(info)}'
-            move_response = Move_Response(move, message,
-                                          pv=info.get('pv', []),
-                                          is_engine_move=len(self.board.move_stack) > 1)
+        self._push_move(move_response.move)
+        if move_response.book_entry:
+            self.book_entries.append(move_response.book_entry)
 
-        self.board.push(move_response.move)
         if not move_response.is_engine_move:
             await self.engine.start_pondering(self.board)
+        self._update_pondering_threads()
 
         print(f'{move_response.public_message} {move_response.private_message}'.strip())
         self.last_message = move_response.public_message
         self.last_pv = move_response.pv
+        self.move_end_time = time.perf_counter()
+        self._start_prefetching()
 
         return Lichess_Move(move_response.move.uci(), self._offer_draw(move_response), self._resign(move_response))
 
-    def update(self, gameState_event: dict[str, Any]) -> None:
+    async def _race_move_sources(self) -> Move_Response:
+        # Book and local tablebases answer at once and may stop pondering, so they are asked before the race.
+        local_sources = [self._make_book_move, self._make_gaviota_move, self._make_syzygy_move]
+        for move_source in self.move_sources:
+            if move_source in local_sources and (move_response := await move_source()):
+                return move_response
+
+        online_sources = [move_source for move_source in self.move_sources if move_source not in local_sources]
+        if not online_sources:
+            return await self._make_engine_move()
+
+        self.is_racing = True
+        engine_task = asyncio.create_task(self._make_engine_move())
+        source_tasks = [asyncio.ensure_future(move_source()) for move_source in online_sources]
+        deadline = time.perf_counter() + self.config.online_moves.racing.latency_budget
+
+        try:
+            for source_task in source_tasks:
+                await asyncio.wait({source_task}, timeout=max(deadline - time.perf_counter(), 0.0))
+                if source_task.done() and (move_response := source_task.result()):
+                    return move_response
+
+            return await engine_task
+        finally:
+            self.is_racing = False
+            for task in [engine_task, *source_tasks]:
+                task.cancel()
+
+    async def _make_engine_move(self) -> Move_Response:
+        await self.update_engine_resources()
+        start_time = time.perf_counter()
+        async with self.resource_governor.reserve(self.game_info.id_, self.engine.threads or 1,
+                                                  self.own_time, self.increment):
+            self._reduce_own_time(time.perf_counter() - start_time)
+            move, info = await self.engine.make_move(self.board, *self.engine_times)
+
+        if 'score' in info:
+            self.scores.append(info['score'])
+        message = f'Engine:  {self._format_move(move):14} {self._format_engine_info(info)}'
+        return Move_Response(move, message,
+                             pv=info.get('pv', []),
+                             is_engine_move=len(self.board.move_stack) > 1)
+
+    async def update(self, gameState_event: dict[str, Any]) -> None:
         moves = gameState_event['moves'].split()
         if len(moves) <= len(self.board.move_stack):
+            self._add_lag_sample(gameState_event)
             return
 
-        self.board.push(chess.Move.from_uci(moves[-1]))
+        await self._stop_prefetching()
+        self._push_move(chess.Move.from_uci(moves[-1]))
         self.white_time = gameState_event['wtime'] / 1000
         self.black_time = gameState_event['btime'] / 1000
 
+        if self.is_our_turn:
+            self.turn_start_time = time.perf_counter()
+            self.turn_start_clock = self.own_time
+
     @property
     def is_our_turn(self) -> bool:
         return self.is_white == self.board.turn
@@ -185,6 +289,19 @@ class Lichess_Game:
     def opponent_time(self) -> float:
         return self.black_time if self.is_white else self.white_time
 
+    @property
+    def move_overhead(self) -> float:
+        return self.lag_estimator.move_overhead
+
+    @property
+    def cache_str(self) -> str | None:
+        if not self.cache_lookups:
+            return
+
+        hit_rate = self.cache_hits / self.cache_lookups * 100.0
+        return (f'Cache hits: {self.cache_hits}/{self.cache_lookups} ({hit_rate:.0f} %)     '
+                f'Saved: {self.cache_time_saved:.1f} s     Prefetched: {self.prefetch_count}')
+
     @property
     def engine_times(self) -> tuple[float, float, float]:
         if self.is_white:
@@ -204,18 +321,52 @@ class Lichess_Game:
 
     async def start_pondering(self) -> None:
         await self.engine.start_pondering(self.board)
+        self._update_pondering_threads()
+
+    async def learn_from_result(self, game_state: dict[str, Any]) -> None:
+        if not self.config.opening_books.write_learn or game_state['status'] in ['aborted', 'noStart']:
+            return
+
+        if winner := game_state.get('winner'):
+            score = 1.0 if (winner == 'white') == self.is_white else 0.0
+        else:
+            score = 0.5
+
+        opponent_rating = self.game_info.black_rating if self.is_white else self.game_info.white_rating
+        for path, entry in self.book_entries:
+            await self.book_registry.add_result(path, entry, score, opponent_rating)
+
+        self.book_entries.clear()
+
+    def _update_pondering_threads(self) -> None:
+        threads = (self.engine.threads or 1) if self.engine.is_pondering else 0
+        self.resource_governor.set_pondering(self.game_info.id_, threads, self._pause_pondering)
+
+    def _pause_pondering(self) -> None:
+        self.pause_pondering_task = asyncio.create_task(self.engine.pause_pondering())
+
+    async def update_engine_resources(self) -> None:
+        threads, hash_size = self.resource_governor.get_limits(self.game_info.id_,
+                                                               self.engine_config.uci_options.get('Threads'),
+                                                               self.engine_config.uci_options.get('Hash'))
+        await self.engine.set_resources(threads, hash_size)
 
     async def close(self) -> None:
+        await self._stop_prefetching()
+
+        self.resource_governor.unregister(self.game_info.id_)
+        if self.pause_pondering_task:
+            await asyncio.wait({self.pause_pondering_task})
         await self.engine.close()
 
-        for book_reader in self.book_settings.readers.values():
-            book_reader.close()
+        for path in self.book_settings.paths.values():
+            await self.book_registry.release(path)
 
         if self.syzygy_tablebase:
-            self.syzygy_tablebase.close()
+            self.tablebase_registry.release(self.syzygy_tablebase)
 
         if self.gaviota_tablebase:
-            self.gaviota_tablebase.close()
+            self.tablebase_registry.release(self.gaviota_tablebase)
 
     def _offer_draw(self, move_response: Move_Response) -> bool:
         if not self.config.offer_draw.enabled:
@@ -268,9 +419,9 @@ class Lichess_Game:
         if self.book_settings.max_depth and self.board.ply() >= self.book_settings.max_depth:
             return
 
-        for name, book_reader in self.book_settings.readers.items():
+        for name, path in self.book_settings.paths.items():
             try:
-                entries = list(book_reader.find_all(self.board))
+                entries = self.book_registry.find_all(path, self.board)
             except struct.error:
                 print(f'Skipping book "{name}" due to error.')
                 continue
@@ -294,10 +445,11 @@ class Lichess_Game:
 
             weight = entry.weight / sum(entry.weight for entry in entries) * 100.0
             learn = entry.learn if self.config.opening_books.read_learn else 0
-            name = name if len(self.book_settings.readers) > 1 else ''
+            name = name if len(self.book_settings.paths) > 1 else ''
             public_message = f'Book:    {self._format_move(entry.move):14}'
             private_message = f'{self._format_book_info(weight, learn)}     {name}'
-            return Move_Response(entry.move, public_message, private_message=private_message)
+            return Move_Response(entry.move, public_message, private_message=private_message,
+                                 book_entry=(path, entry))
 
     def _get_book_settings(self) -> Book_Settings:
         if not self.config.opening_books.enabled:
@@ -308,10 +460,7 @@ class Lichess_Game:
             return Book_Settings()
 
         books_config = self.config.opening_books.books[key]
-        return Book_Settings(books_config.selection,
-                             books_config.max_depth,
-                             {name: chess.polyglot.open_reader(path)
-                              for name, path in books_config.names.items()})
+        return Book_Settings(books_config.selection, books_config.max_depth, dict(books_config.names))
 
     def _get_book_key(self) -> str | None:
         color = 'white' if self.is_white else 'black'
@@ -362,27 +511,11 @@ class Lichess_Game:
         if out_of_book or too_deep or out_of_range or too_many_moves or not has_time:
             return
 
-        if self.config.online_moves.opening_explorer.anti:
-            color = 'black' if self.board.turn else 'white'
-            username = self.game_info.black_name if self.board.turn else self.game_info.white_name
-        else:
-            color = 'white' if self.board.turn else 'black'
-            username = self.game_info.white_name if self.board.turn else self.game_info.black_name
-
-        speeds = self.game_info.speed if self.game_info.variant == Variant.STANDARD else None
-        modes = 'rated' if self.game_info.rated else None
-
-        start_time = time.perf_counter()
-        response = await self.api.get_opening_explorer(username,
-                                                       self.board.fen(),
-                                                       self.game_info.variant,
-                                                       color,
-                                                       modes,
-                                                       speeds,
-                                                       self.config.online_moves.opening_explorer.timeout)
+        response = await self._get_online_response('opening_explorer', self.board,
+                                                   *self._get_opening_explorer_request(self.board))
         if response is None:
-            self.out_of_opening_explorer_counter += 1
-            self._reduce_own_time(time.perf_counter() - start_time)
+            if not Circuit_Breaker.get('opening_explorer').is_blocking:
+                self.out_of_opening_explorer_counter += 1
             return
 
         game_count = response['white'] + response['draws'] + response['black']
@@ -413,6 +546,26 @@ class Lichess_Game:
                            f'WDL: {top_move["wins"]}/{top_move["draws"]}/{top_move["losses"]}')
         return Move_Response(move, public_message, private_message=private_message)
 
+    def _get_opening_explorer_request(self, board: chess.Board) -> tuple[dict[str, Any], Online_Request]:
+        if self.config.online_moves.opening_explorer.anti:
+            color = 'black' if board.turn else 'white'
+            username = self.game_info.black_name if board.turn else self.game_info.white_name
+        else:
+            color = 'white' if board.turn else 'black'
+            username = self.game_info.white_name if board.turn else self.game_info.black_name
+
+        speeds = self.game_info.speed if self.game_info.variant == Variant.STANDARD else None
+        modes = 'rated' if self.game_info.rated else None
+
+        params = {'username': username, 'color': color, 'modes': modes, 'speeds': speeds}
+        return params, lambda: self.api.get_opening_explorer(username,
+                                                             board.fen(),
+                                                             self.game_info.variant,
+                                                             color,
+                                                             modes,
+                                                             speeds,
+                                                             self.config.online_moves.opening_explorer.timeout)
+
     def _get_opening_explorer_top_move(self, moves: list[dict[str, Any]]) -> dict[str, Any]:
         if self.config.online_moves.opening_explorer.selection == 'win_rate':
             def win_rate(move: dict[str, Any]) -> float:
@@ -442,13 +595,10 @@ class Lichess_Game:
         if out_of_book or too_deep or too_many_moves or not has_time:
             return
 
-        start_time = time.perf_counter()
-        response = await self.api.get_cloud_eval(self.board.fen().replace('[', '/').replace(']', ''),
-                                                 self.game_info.variant,
-                                                 self.config.online_moves.lichess_cloud.timeout)
+        response = await self._get_online_response('lichess_cloud', self.board, *self._get_cloud_request(self.board))
         if response is None:
-            self.out_of_cloud_counter += 1
-            self._reduce_own_time(time.perf_counter() - start_time)
+            if not Circuit_Breaker.get('lichess_cloud').is_blocking:
+                self.out_of_cloud_counter += 1
             return
 
         if 'error' in response:
@@ -475,6 +625,11 @@ class Lichess_Game:
                    f'Depth: {response["depth"]}')
         return Move_Response(pv[0], message, pv=pv)
 
+    def _get_cloud_request(self, board: chess.Board) -> tuple[dict[str, Any], Online_Request]:
+        return {}, lambda: self.api.get_cloud_eval(board.fen().replace('[', '/').replace(']', ''),
+                                                   self.game_info.variant,
+                                                   self.config.online_moves.lichess_cloud.timeout)
+
     async def _make_chessdb_move(self) -> Move_Response | None:
         out_of_book = self.out_of_chessdb_counter >= 5
         too_deep = (False
@@ -489,11 +644,10 @@ class Lichess_Game:
         if out_of_book or too_deep or too_many_moves or not has_time or is_endgame:
             return
 
-        start_time = time.perf_counter()
-        response = await self.api.get_chessdb_eval(self.board.fen(), self.config.online_moves.chessdb.timeout)
+        response = await self._get_online_response('chessdb', self.board, *self._get_chessdb_request(self.board))
         if response is None:
-            self.out_of_chessdb_counter += 1
-            self._reduce_own_time(time.perf_counter() - start_time)
+            if not Circuit_Breaker.get('chessdb').is_blocking:
+                self.out_of_chessdb_counter += 1
             return
 
         if response['status'] != 'ok':
@@ -529,13 +683,19 @@ class Lichess_Game:
         message = f'ChessDB: {self._format_move(move):14} {self._format_score(pov_score)}     {candidates}'
         return Move_Response(move, message)
 
-    def _probe_gaviota(self, moves: Iterable[chess.Move]) -> Gaviota_Result:
+    def _get_chessdb_request(self, board: chess.Board) -> tuple[dict[str, Any], Online_Request]:
+        return {}, lambda: self.api.get_chessdb_eval(board.fen(), self.config.online_moves.chessdb.timeout)
+
+    async def _probe_gaviota(self, moves: Iterable[chess.Move]) -> Gaviota_Result:
+        return await self.tablebase_registry.run_gaviota(self._probe_gaviota_moves,
+                                                         self.board.copy(stack=False), list(moves))
+
+    def _probe_gaviota_moves(self, board_copy: chess.Board, moves: list[chess.Move]) -> Gaviota_Result:
         assert self.gaviota_tablebase
 
         best_move = chess.Move.null()
         best_wdl = -2
         best_dtm = 1_000_000
-        board_copy = self.board.copy(stack=False)
         for move in moves:
             board_copy.push(move)
 
@@ -571,7 +731,7 @@ class Lichess_Game:
                     return
 
                 try:
-                    result = self._probe_gaviota(self.board.generate_legal_captures())
+                    result = await self._probe_gaviota(self.board.generate_legal_captures())
                 except KeyError:
                     return
 
@@ -579,7 +739,7 @@ class Lichess_Game:
                     return
             case _:
                 try:
-                    result = self._probe_gaviota(self.board.generate_legal_moves())
+                    result = await self._probe_gaviota(self.board.generate_legal_moves())
                 except KeyError:
                     return
 
@@ -599,26 +759,33 @@ class Lichess_Game:
             case _:
                 return
 
-        await self.engine.stop_pondering(self.board)
+        await self.engine.stop_pondering()
         message = f'Gaviota: {self._format_move(result.move):14} {egtb_info}'
         return Move_Response(result.move, message, is_drawish=offer_draw, is_resignable=resign)
 
-    def _probe_syzygy(self, moves: Iterable[chess.Move]) -> Syzygy_Result:
+    async def _probe_syzygy(self, moves: Iterable[chess.Move]) -> Syzygy_Result:
         assert self.syzygy_tablebase
 
+        child_boards: list[chess.Board] = []
+        for move in moves:
+            child_board = self.board.copy(stack=False)
+            child_board.push(move)
+            child_boards.append(child_board)
+
+        dtzs = await asyncio.gather(*(self.tablebase_registry.run(self.syzygy_tablebase.probe_dtz, child_board)
+                                      for child_board in child_boards))
+
         best_move = chess.Move.null()
         best_wdl = -2
         best_dtz = 1_000_000
         best_real_dtz = 0
-        board_copy = self.board.copy(stack=False)
-        for move in moves:
-            board_copy.push(move)
-
-            dtz = -self.syzygy_tablebase.probe_dtz(board_copy)
-            wdl = self._value_to_wdl(dtz, board_copy.halfmove_clock)
+        for child_board, child_dtz in zip(child_boards, dtzs):
+            move = child_board.peek()
+            dtz = -child_dtz
+            wdl = self._value_to_wdl(dtz, child_board.halfmove_clock)
 
             real_dtz = dtz
-            if board_copy.halfmove_clock == 0:
+            if child_board.halfmove_clock == 0:
                 if wdl < 0:
                     dtz += 10_000
                 elif wdl > 0:
@@ -640,8 +807,6 @@ class Lichess_Game:
                 best_dtz = dtz
                 best_real_dtz = real_dtz
 
-            board_copy.pop()
-
         return Syzygy_Result(best_move, best_wdl, best_real_dtz)
 
     async def _make_syzygy_move(self) -> Move_Response | None:
@@ -650,7 +815,7 @@ class Lichess_Game:
                 return
             case pieces if pieces == self.syzygy_config.max_pieces + 1:
                 try:
-                    result = self._probe_syzygy(self.board.generate_legal_captures())
+                    result = await self._probe_syzygy(self.board.generate_legal_captures())
                 except KeyError:
                     return
 
@@ -658,7 +823,7 @@ class Lichess_Game:
                     return
             case _:
                 try:
-                    result = self._probe_syzygy(self.board.generate_legal_moves())
+                    result = await self._probe_syzygy(self.board.generate_legal_moves())
                 except KeyError:
                     return
 
@@ -684,7 +849,7 @@ class Lichess_Game:
                 offer_draw = False
                 resign = True
 
-        await self.engine.stop_pondering(self.board)
+        await self.engine.stop_pondering()
         message = f'Syzygy:  {self._format_move(result.move):14} {egtb_info}'
         return Move_Response(result.move, message, is_drawish=offer_draw, is_resignable=resign)
 
@@ -704,46 +869,33 @@ class Lichess_Game:
         return 0
 
     def _get_syzygy_tablebase(self) -> chess.syzygy.Tablebase | None:
-        if not (self.syzygy_config.enabled and self.syzygy_config.instant_play):
+        if not self.syzygy_config.enabled:
             return
 
-        tablebase = chess.syzygy.open_tablebase(self.syzygy_config.paths[0], VariantBoard=type(self.board))
-
-        for path in self.syzygy_config.paths[1:]:
-            tablebase.add_directory(path)
+        if not (self.syzygy_config.instant_play or self.config.online_moves.online_egtb.enabled):
+            return
 
-        return tablebase
+        return self.tablebase_registry.acquire_syzygy(self.syzygy_config.paths, type(self.board))
 
     def _get_gaviota_tablebase(self) -> chess.gaviota.PythonTablebase | chess.gaviota.NativeTablebase | None:
         if not self.config.gaviota.enabled:
             return
 
-        tablebase = chess.gaviota.open_tablebase(self.config.gaviota.paths[0])
-
-        for path in self.config.gaviota.paths[1:]:
-            tablebase.add_directory(path)
-
-        return tablebase
+        return self.tablebase_registry.acquire_gaviota(self.config.gaviota.paths)
 
     async def _make_egtb_move(self) -> Move_Response | None:
-        max_pieces = 7 if self.board.uci_variant == 'chess' else 6
-        match chess.popcount(self.board.occupied):
-            case pieces if pieces > max_pieces + 1:
-                return
-            case pieces if pieces == max_pieces + 1:
-                if not any(self.board.generate_legal_captures()):
-                    return
+        if not self._is_egtb_position(self.board):
+            return
+
+        if self.syzygy_tablebase and not self.syzygy_config.instant_play:
+            if move_response := await self._make_syzygy_move():
+                return move_response
 
         if not self._has_time(self.config.online_moves.online_egtb.min_time) or self._has_mate_score():
             return
 
-        variant = 'standard' if self.board.uci_variant == 'chess' else self.board.uci_variant
-        assert variant
-
-        start_time = time.perf_counter()
-        response = await self.api.get_egtb(self.board.fen(), variant, self.config.online_moves.online_egtb.timeout)
+        response = await self._get_online_response('online_egtb', self.board, *self._get_egtb_request(self.board))
         if response is None:
-            self._reduce_own_time(time.perf_counter() - start_time)
             return
 
         outcome: str = response['category']
@@ -759,6 +911,24 @@ class Lichess_Game:
         message = f'EGTB:    {self._format_move(move):14} {self._format_egtb_info(outcome, dtz, dtm)}'
         return Move_Response(move, message, is_drawish=offer_draw, is_resignable=resign)
 
+    def _get_egtb_request(self, board: chess.Board) -> tuple[dict[str, Any], Online_Request]:
+        variant = 'standard' if board.uci_variant == 'chess' else board.uci_variant
+        assert variant
+
+        return ({'halfmove_clock': board.halfmove_clock},
+                lambda: self.api.get_egtb(board.fen(), variant, self.config.online_moves.online_egtb.timeout))
+
+    @staticmethod
+    def _is_egtb_position(board: chess.Board) -> bool:
+        max_pieces = 7 if board.uci_variant == 'chess' else 6
+        match chess.popcount(board.occupied):
+            case pieces if pieces > max_pieces + 1:
+                return False
+            case pieces if pieces == max_pieces + 1:
+                return any(board.generate_legal_captures())
+
+        return True
+
     def _format_move(self, move: chess.Move) -> str:
         if self.board.turn:
             move_number = f'{self.board.fullmove_number}.'
@@ -862,16 +1032,16 @@ class Lichess_Game:
 
         opening_explorer_config = self.config.online_moves.opening_explorer
         if opening_explorer_config.enabled:
-            if not opening_explorer_config.only_without_book or not self.book_settings.readers:
+            if not opening_explorer_config.only_without_book or not self.book_settings.paths:
                 if self.board.uci_variant == 'chess' or opening_explorer_config.use_for_variants:
                     opening_sources[self._make_opening_explorer_move] = opening_explorer_config.priority
 
         if self.config.online_moves.lichess_cloud.enabled:
-            if not self.config.online_moves.lichess_cloud.only_without_book or not self.book_settings.readers:
+            if not self.config.online_moves.lichess_cloud.only_without_book or not self.book_settings.paths:
                 opening_sources[self._make_cloud_move] = self.config.online_moves.lichess_cloud.priority
 
         if self.config.online_moves.chessdb.enabled:
-            if not self.config.online_moves.chessdb.only_without_book or not self.book_settings.readers:
+            if not self.config.online_moves.chessdb.only_without_book or not self.book_settings.paths:
                 if self.board.uci_variant == 'chess':
                     opening_sources[self._make_chessdb_move] = self.config.online_moves.chessdb.priority
 
@@ -881,11 +1051,23 @@ class Lichess_Game:
 
         return move_sources
 
-    def _get_move_overhead(self, engine_config: Engine_Config) -> float:
+    def _get_lag_estimator(self, engine_config: Engine_Config) -> Lag_Estimator:
         move_overhead_multiplier = (1.0
                                     if engine_config.move_overhead_multiplier is None
                                     else engine_config.move_overhead_multiplier)
-        return max(self.game_info.initial_time_ms / 60_000 * move_overhead_multiplier, 1.0)
+        max_move_overhead = max(self.game_info.initial_time_ms / 60_000 * move_overhead_multiplier, 1.0)
+        return Lag_Estimator(max_move_overhead, move_overhead_multiplier)
+
+    def _add_lag_sample(self, gameState_event: dict[str, Any]) -> None:
+        if self.move_end_time is None or self.is_our_turn:
+            return
+
+        if len(self.board.move_stack) > 2:
+            own_time = (gameState_event['wtime'] if self.is_white else gameState_event['btime']) / 1000
+            charged_time = self.turn_start_clock + self.increment - own_time
+            self.lag_estimator.add_sample(charged_time - (self.move_end_time - self.turn_start_time))
+
+        self.move_end_time = None
 
     def _has_time(self, min_time: float) -> bool:
         if len(self.board.move_stack) < 2:
@@ -896,6 +1078,133 @@ class Lichess_Game:
 
         return self.own_time >= min_time
 
+    async def _get_online_response(self,
+                                   source: str,
+                                   board: chess.Board,
+                                   params: dict[str, Any],
+                                   request: Online_Request
+                                   ) -> dict[str, Any] | None:
+        if self.position_cache.enabled:
+            self.cache_lookups += 1
+
+        if cached_response := self.position_cache.get(source, board, params):
+            self.cache_hits += 1
+            self.cache_time_saved += cached_response.fetch_time
+            return cached_response.response
+
+        start_time = time.perf_counter()
+        response = await self.single_flight.run(source, board, params, request)
+        fetch_time = time.perf_counter() - start_time
+        if response is None:
+            # While racing the engine searches at the same time, the fetch costs no extra clock time.
+            if not self.is_racing:
+                self._reduce_own_time(fetch_time)
+            return
+
+        self.position_cache.put(source, board, params, response, fetch_time)
+        return response
+
+    def _start_prefetching(self) -> None:
+        if self.prefetch_task:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+
+        if not self.position_cache.prefetch or self.is_our_turn or self.board.is_game_over():
+            return
+
+        self.prefetch_task = asyncio.create_task(self._prefetch())
+
+    async def _stop_prefetching(self) -> None:
+        if self.prefetch_task:
+            self.prefetch_task.cancel()
+            await asyncio.wait({self.prefetch_task})
+            self.prefetch_task = None
+
+    async def _prefetch(self) -> None:
+        prefetch_sources = self._get_prefetch_sources()
+        if not prefetch_sources:
+            return
+
+        # The position the prefetch was started for, self.board moves on while requests are awaited.
+        base = self.board.copy(stack=False)
+        replies = self._get_predicted_replies()
+        if self._make_egtb_move in self.move_sources and self._is_egtb_position(base):
+            if response := await self._prefetch_response('online_egtb', base, *self._get_egtb_request(base)):
+                replies = [chess.Move.from_uci(egtb_move['uci'])
+                           for egtb_move in response['moves'][:MAX_PREFETCH_REPLIES]]
+
+        for reply in replies:
+            board = base.copy(stack=False)
+            board.push(reply)
+            await asyncio.gather(*(self._prefetch_response(source, board, *get_request(board))
+                                   for source, get_request in prefetch_sources
+                                   if source != 'online_egtb' or self._is_egtb_position(board)))
+
+    async def _prefetch_response(self,
+                                 source: str,
+                                 board: chess.Board,
+                                 params: dict[str, Any],
+                                 request: Online_Request) -> dict[str, Any] | None:
+        if cached_response := self.position_cache.peek(source, board, params):
+            return cached_response
+
+        if source in self.position_cache.prefetching:
+            return
+
+        request_class = BUDGETED_SOURCES.get(source)
+        if request_class and not self.api.request_scheduler.has_spare_budget(request_class):
+            return
+
+        self.position_cache.prefetching.add(source)
+        try:
+            start_time = time.perf_counter()
+            response = await self.single_flight.run(source, board, params, request)
+            if response is None:
+                return
+
+            self.position_cache.put(source, board, params, response, time.perf_counter() - start_time)
+            self.prefetch_count += 1
+            return response
+        finally:
+            self.position_cache.prefetching.discard(source)
+
+    def _get_prefetch_sources(self) -> list[tuple[str, Callable[[chess.Board], tuple[dict[str, Any], Online_Request]]]]:
+        prefetch_sources: list[tuple[str, Callable[[chess.Board], tuple[dict[str, Any], Online_Request]]]] = []
+
+        if self._make_opening_explorer_move in self.move_sources and self.out_of_opening_explorer_counter < 5:
+            prefetch_sources.append(('opening_explorer', self._get_opening_explorer_request))
+
+        if self._make_cloud_move in self.move_sources and self.out_of_cloud_counter < 5:
+            prefetch_sources.append(('lichess_cloud', self._get_cloud_request))
+
+        if self._make_chessdb_move in self.move_sources and self.out_of_chessdb_counter < 5:
+            prefetch_sources.append(('chessdb', self._get_chessdb_request))
+
+        if self._make_egtb_move in self.move_sources:
+            prefetch_sources.append(('online_egtb', self._get_egtb_request))
+
+        return [(source, get_request) for source, get_request in prefetch_sources
+                if not Circuit_Breaker.get(source).is_blocking]
+
+    def _get_predicted_replies(self) -> list[chess.Move]:
+        replies: list[chess.Move] = []
+
+        if len(self.last_pv) > 1 and self.last_pv[0] == self.board.peek() and self.board.is_legal(self.last_pv[1]):
+            replies.append(self.last_pv[1])
+
+        book_entries: list[chess.polyglot.Entry] = []
+        for path in self.book_settings.paths.values():
+            try:
+                book_entries += self.book_registry.find_all(path, self.board)
+            except struct.error:
+                continue
+
+        for entry in sorted(book_entries, key=lambda entry: entry.weight, reverse=True):
+            if entry.move not in replies:
+                replies.append(entry.move)
+
+        return replies[:MAX_PREFETCH_REPLIES]
+
     def _reduce_own_time(self, seconds: float) -> None:
         if len(self.board.move_stack) < 2:
             return
@@ -905,10 +1214,32 @@ class Lichess_Game:
         else:
             self.black_time -= seconds
 
+    def _push_move(self, move: chess.Move) -> None:
+        self.board.push(move)
+        self.position_counts[self._get_position_key(self.board)] += 1
+
     def _is_repetition(self, move: chess.Move) -> bool:
-        board = self.board.copy()
-        board.push(move)
-        return board.is_repetition(count=2)
+        self.board.push(move)
+        position_key = self._get_position_key(self.board)
+        self.board.pop()
+        return self.position_counts[position_key] > 0
+
+    @classmethod
+    def _get_position_counts(cls, board: chess.Board) -> Counter[Hashable]:
+        replay_board = board.root()
+        position_counts: Counter[Hashable] = Counter([cls._get_position_key(replay_board)])
+        for move in board.move_stack:
+            replay_board.push(move)
+            position_counts[cls._get_position_key(replay_board)] += 1
+
+        return position_counts
+
+    @staticmethod
+    def _get_position_key(board: chess.Board) -> Hashable:
+        if isinstance(board, CrazyhouseBoard | ThreeCheckBoard):
+            return chess.polyglot.zobrist_hash(board), board.epd()
+
+        return chess.polyglot.zobrist_hash(board)
 
     def _has_mate_score(self) -> bool:
         if not self.scores:
@@ -0,0 +1,518 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import aiohttp
+import chess
+import psutil
+import yaml
+from aiohttp import web
+
+import api as api_module
+from api import API
+from config import Config
+from event_handler import Event_Handler
+from game_manager import Game_Manager
+
+USERNAME = 'StandInBot'
+KEEP_ALIVE_INTERVAL = 5.0
+STREAM_PATHS = ('/api/stream/event', '/api/bot/game/stream/')
+
+
+class Stand_In_Game:
+    def __init__(self, game_id: str, bot_color: chess.Color, initial_ms: int, increment_ms: int) -> None:
+        self.game_id = game_id
+        self.bot_color = bot_color
+        self.board = chess.Board()
+        self.times = {chess.WHITE: initial_ms, chess.BLACK: initial_ms}
+        self.increment_ms = increment_ms
+        self.initial_ms = initial_ms
+        self.status = 'started'
+        self.winner: str | None = None
+        self.listeners: set[asyncio.Queue[dict[str, Any]]] = set()
+        self.turn_start = 0.0
+        self.is_started = False
+
+    @property
+    def state(self) -> dict[str, Any]:
+        state = {'type': 'gameState',
+                 'moves': ' '.join(move.uci() for move in self.board.move_stack),
+                 'wtime': self.times[chess.WHITE],
+                 'btime': self.times[chess.BLACK],
+                 'winc': self.increment_ms,
+                 'binc': self.increment_ms,
+                 'status': self.status}
+        if self.winner:
+            state['winner'] = self.winner
+
+        return state
+
+    @property
+    def full(self) -> dict[str, Any]:
+        bot = {'id': USERNAME.lower(), 'name': USERNAME, 'title': 'BOT', 'rating': 2000}
+        opponent = {'id': f'opponent_{self.game_id}', 'name': f'Opponent_{self.game_id}', 'title': 'BOT',
+                    'rating': 2000}
+        return {'type': 'gameFull',
+                'id': self.game_id,
+                'rated': False,
+                'variant': {'key': 'standard', 'name': 'Standard', 'short': 'Std'},
+                'clock': {'initial': self.initial_ms, 'increment': self.increment_ms},
+                'speed': 'bullet',
+                'perf': {'name': 'Bullet'},
+                'white': bot if self.bot_color == chess.WHITE else opponent,
+                'black': opponent if self.bot_color == chess.WHITE else bot,
+                'initialFen': 'startpos',
+                'state': self.state}
+
+    @property
+    def is_bot_turn(self) -> bool:
+        return self.status == 'started' and self.board.turn == self.bot_color
+
+    def broadcast(self, event: dict[str, Any]) -> None:
+        for listener in self.listeners:
+            listener.put_nowait(event)
+
+
+class Lichess_Stand_In:
+    def __init__(self,
+                 games: int,
+                 initial_time: float,
+                 increment: float,
+                 opponent_move_time: float,
+                 latency: float,
+                 failure_rate: float,
+                 max_plies: int,
+                 online_time: float,
+                 cloud_plies: int,
+                 follow_cloud: float) -> None:
+        self.games = {f'game{index:04}': Stand_In_Game(f'game{index:04}', index % 2 == 0,
+                                                       int(initial_time * 1000), int(increment * 1000))
+                      for index in range(games)}
+        self.opponent_move_time = opponent_move_time
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_plies = max_plies
+        self.online_time = online_time
+        self.cloud_plies = cloud_plies
+        self.follow_cloud = follow_cloud
+        self.move_latencies: list[float] = []
+        self.failures = 0
+        self.event_listeners: set[asyncio.Queue[dict[str, Any]]] = set()
+        self.background_tasks: set[asyncio.Task[None]] = set()
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._network_middleware])
+        app.router.add_get('/', self._handle_ok)
+        app.router.add_get('/api/account', self._handle_account)
+        app.router.add_post('/api/token/test', self._handle_token_test)
+        app.router.add_get('/api/stream/event', self._handle_event_stream)
+        app.router.add_get('/api/bot/game/stream/{game_id}', self._handle_game_stream)
+        app.router.add_post('/api/bot/game/{game_id}/move/{uci_move}', self._handle_move)
+        app.router.add_post('/api/bot/game/{game_id}/abort', self._handle_abort)
+        app.router.add_post('/api/bot/game/{game_id}/resign', self._handle_resign)
+        app.router.add_post('/api/bot/game/{game_id}/chat', self._handle_ok)
+        app.router.add_post('/api/bot/game/{game_id}/claim-victory', self._handle_ok)
+        app.router.add_post('/api/challenge/{challenge_id}/{action:accept|decline|cancel}', self._handle_ok)
+        app.router.add_post('/api/challenge/{username}', self._handle_create_challenge)
+        app.router.add_get('/api/bot/online', self._handle_online_bots)
+        app.router.add_get('/api/users/status', self._handle_users_status)
+        app.router.add_get('/api/cloud-eval', self._handle_cloud_eval)
+        app.router.add_get('/player', self._handle_explorer)
+        app.router.add_get('/cdb.php', self._handle_chessdb)
+        app.router.add_get('/{variant}', self._handle_tablebase)
+        app.router.add_get('/stand-in/stats', self._handle_stats)
+        return app
+
+    @web.middleware
+    async def _network_middleware(self,
+                                  request: web.Request,
+                                  handler: Callable[[web.Request], Awaitable[web.StreamResponse]]
+                                  ) -> web.StreamResponse:
+        if request.path.startswith('/stand-in/'):
+            return await handler(request)
+
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+        if not request.path.startswith(STREAM_PATHS) and random.random() < self.failure_rate:
+            self.failures += 1
+            return web.json_response({'error': 'Injected failure'}, status=500)
+
+        return await handler(request)
+
+    async def _handle_ok(self, _request: web.Request) -> web.Response:
+        return web.json_response({'ok': True})
+
+    async def _handle_account(self, _request: web.Request) -> web.Response:
+        return web.json_response({'id': USERNAME.lower(), 'username': USERNAME, 'title': 'BOT',
+                                  'perfs': {'bullet': {'rating': 2000}, 'blitz': {'rating': 2000}}})
+
+    async def _handle_token_test(self, request: web.Request) -> web.Response:
+        token = await request.text()
+        return web.json_response({token: {'scopes': 'bot:play', 'userId': USERNAME.lower()}})
+
+    async def _handle_event_stream(self, request: web.Request) -> web.StreamResponse:
+        response = await self._open_stream(request)
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self.event_listeners.add(queue)
+        try:
+            for game in self.games.values():
+                if game.status == 'started':
+                    await self._write_event(response, {'type': 'gameStart', 'game': {'id': game.game_id,
+                                                                                     'gameId': game.game_id}})
+
+            await self._write_events(response, queue, lambda: True)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.event_listeners.discard(queue)
+
+        return response
+
+    async def _handle_game_stream(self, request: web.Request) -> web.StreamResponse:
+        if (game := self.games.get(request.match_info['game_id'])) is None:
+            return web.json_response({'error': 'Not found'}, status=404)
+
+        response = await self._open_stream(request)
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        game.listeners.add(queue)
+        try:
+            await self._write_event(response, game.full)
+
+            if not game.is_started:
+                game.is_started = True
+                game.turn_start = time.perf_counter()
+                if not game.is_bot_turn:
+                    self._start_opponent_move(game)
+
+            await self._write_events(response, queue, lambda: game.status == 'started')
+
+            while not queue.empty():
+                await self._write_event(response, queue.get_nowait())
+        except ConnectionResetError:
+            pass
+        finally:
+            game.listeners.discard(queue)
+
+        return response
+
+    async def _handle_move(self, request: web.Request) -> web.Response:
+        game = self.games.get(request.match_info['game_id'])
+        if game is None or not game.is_bot_turn:
+            return web.json_response({'error': 'Not your turn, or game already over'}, status=400)
+
+        try:
+            move = chess.Move.from_uci(request.match_info['uci_move'])
+        except ValueError:
+            move = chess.Move.null()
+
+        if not game.board.is_legal(move):
+            return web.json_response({'error': f'Illegal move: {request.match_info["uci_move"]}'}, status=400)
+
+        self.move_latencies.append(time.perf_counter() - game.turn_start)
+        self._play(game, move)
+        if game.status == 'started':
+            self._start_opponent_move(game)
+
+        return web.json_response({'ok': True})
+
+    async def _handle_abort(self, request: web.Request) -> web.Response:
+        return self._end_game(request.match_info['game_id'], 'aborted', None)
+
+    async def _handle_resign(self, request: web.Request) -> web.Response:
+        game_id = request.match_info['game_id']
+        if game_id not in self.games:
+            return web.json_response({'error': 'Not found'}, status=404)
+
+        return self._end_game(game_id, 'resign', 'black' if self.games[game_id].bot_color else 'white')
+
+    async def _handle_create_challenge(self, _request: web.Request) -> web.Response:
+        return web.json_response({'done': 'declined'})
+
+    async def _handle_online_bots(self, _request: web.Request) -> web.Response:
+        return web.Response(text='', content_type='application/x-ndjson')
+
+    async def _handle_users_status(self, request: web.Request) -> web.Response:
+        return web.json_response([{'id': user_id, 'name': user_id, 'online': True}
+                                  for user_id in request.query.get('ids', '').split(',') if user_id])
+
+    async def _handle_cloud_eval(self, request: web.Request) -> web.Response:
+        await self._wait_online_time()
+        board = chess.Board(request.query['fen'])
+        if board.ply() >= self.cloud_plies or board.is_game_over():
+            return web.json_response({'error': 'Not found'}, status=404)
+
+        pv = [self._get_cloud_move(board)]
+        board.push(pv[0])
+        if not board.is_game_over():
+            pv.append(self._get_cloud_move(board))
+
+        return web.json_response({'fen': request.query['fen'], 'knodes': 1000, 'depth': 40,
+                                  'pvs': [{'moves': ' '.join(move.uci() for move in pv), 'cp': 0}]})
+
+    async def _handle_explorer(self, _request: web.Request) -> web.Response:
+        await self._wait_online_time()
+        return web.Response(text=json.dumps({'white': 0, 'draws': 0, 'black': 0, 'moves': []}) + '\n',
+                            content_type='application/x-ndjson')
+
+    async def _handle_chessdb(self, _request: web.Request) -> web.Response:
+        await self._wait_online_time()
+        return web.json_response({'status': 'unknown'})
+
+    async def _handle_tablebase(self, _request: web.Request) -> web.Response:
+        await self._wait_online_time()
+        return web.json_response({'category': 'unknown', 'dtz': None, 'dtm': None, 'moves': []})
+
+    async def _handle_stats(self, _request: web.Request) -> web.Response:
+        return web.json_response({'games': len(self.games),
+                                  'finished': sum(game.status != 'started' for game in self.games.values()),
+                                  'move_latencies': self.move_latencies,
+                                  'failures': self.failures})
+
+    def _start_opponent_move(self, game: Stand_In_Game) -> None:
+        task = asyncio.create_task(self._make_opponent_move(game))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _make_opponent_move(self, game: Stand_In_Game) -> None:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.opponent_move_time)
+        if game.status != 'started':
+            return
+
+        if random.random() < self.follow_cloud:
+            move = self._get_cloud_move(game.board)
+        else:
+            move = random.choice(list(game.board.legal_moves))
+
+        self._play(game, move)
+        game.turn_start = time.perf_counter()
+
+    async def _wait_online_time(self) -> None:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.online_time)
+
+    def _play(self, game: Stand_In_Game, move: chess.Move) -> None:
+        elapsed_ms = int((time.perf_counter() - game.turn_start) * 1000)
+        game.times[game.board.turn] = max(game.times[game.board.turn] - elapsed_ms, 0) + game.increment_ms
+        game.board.push(move)
+
+        if outcome := game.board.outcome(claim_draw=True):
+            game.status = 'mate' if outcome.termination == chess.Termination.CHECKMATE else 'draw'
+            if outcome.winner is not None:
+                game.winner = 'white' if outcome.winner else 'black'
+        elif game.board.ply() >= self.max_plies:
+            game.status = 'draw'
+
+        game.broadcast(game.state)
+        if game.status != 'started':
+            self._broadcast_finish(game)
+
+    def _end_game(self, game_id: str, status: str, winner: str | None) -> web.Response:
+        if (game := self.games.get(game_id)) is None or game.status != 'started':
+            return web.json_response({'error': 'Game already over'}, status=400)
+
+        game.status = status
+        game.winner = winner
+        game.broadcast(game.state)
+        self._broadcast_finish(game)
+        return web.json_response({'ok': True})
+
+    def _broadcast_finish(self, game: Stand_In_Game) -> None:
+        for listener in self.event_listeners:
+            listener.put_nowait({'type': 'gameFinish', 'game': {'id': game.game_id, 'gameId': game.game_id}})
+
+    @staticmethod
+    def _get_cloud_move(board: chess.Board) -> chess.Move:
+        # The stand-in cloud always answers a position with the same move, so its predicted replies can come true.
+        return random.Random(board.epd()).choice(list(board.legal_moves))
+
+    @staticmethod
+    async def _open_stream(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        return response
+
+    @staticmethod
+    async def _write_event(response: web.StreamResponse, event: dict[str, Any]) -> None:
+        await response.write(json.dumps(event).encode() + b'\n')
+
+    async def _write_events(self,
+                            response: web.StreamResponse,
+                            queue: asyncio.Queue[dict[str, Any]],
+                            is_open: Callable[[], bool]) -> None:
+        # The pending get survives keep-alives, wait_for on queue.get() can drop events before Python 3.12.
+        get_task = asyncio.ensure_future(queue.get())
+        try:
+            while is_open():
+                done, _ = await asyncio.wait({get_task}, timeout=KEEP_ALIVE_INTERVAL)
+                if not done:
+                    await response.write(b'\n')
+                    continue
+
+                await self._write_event(response, get_task.result())
+                get_task = asyncio.ensure_future(queue.get())
+        finally:
+            get_task.cancel()
+
+
+async def _serve(port: int, stand_in: Lichess_Stand_In) -> None:
+    runner = web.AppRunner(stand_in.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    print(f'Lichess stand-in with {len(stand_in.games)} games listening on http://127.0.0.1:{port}', flush=True)
+    await asyncio.Event().wait()
+
+
+async def _benchmark(config_path: str,
+                     game_counts: list[int],
+                     server_args: list[str],
+                     cache: bool,
+                     prefetch: bool,
+                     instant_engine: bool,
+                     verbose: bool) -> None:
+    with open(config_path, encoding='utf-8') as config_file:
+        yaml_config = yaml.safe_load(config_file)
+
+    yaml_config['token'] = 'stand-in'
+    print(f'{"Games":>5} {"Moves":>6} {"p50":>9} {"p90":>9} {"p99":>9} {"CPU":>7} {"RSS":>9} {"Failures":>9} '
+          f'{"Cached":>7}')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if instant_engine:
+            engine_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instant_engine.py')
+            engine_path = os.path.join(temp_dir, 'instant_engine')
+            with open(engine_path, 'w', encoding='utf-8') as engine_file:
+                engine_file.write(f'#!/bin/sh\nexec "{sys.executable}" "{engine_script}"\n')
+            os.chmod(engine_path, 0o755)
+
+            for engine_section in yaml_config['engines'].values():
+                engine_section['dir'] = temp_dir
+                engine_section['name'] = 'instant_engine'
+
+        for game_count in game_counts:
+            with socket.socket() as free_socket:
+                free_socket.bind(('127.0.0.1', 0))
+                port = free_socket.getsockname()[1]
+
+            url = f'http://127.0.0.1:{port}'
+            server = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), 'serve',
+                                                          '--port', str(port), '--games', str(game_count), *server_args,
+                                                          stdout=asyncio.subprocess.PIPE)
+            assert server.stdout
+            await server.stdout.readline()
+
+            yaml_config['url'] = url
+            yaml_config.setdefault('challenge', {})['concurrency'] = game_count
+            with tempfile.NamedTemporaryFile('w', suffix='.yml', delete=False, encoding='utf-8') as temp_config:
+                yaml.safe_dump(yaml_config, temp_config)
+
+            try:
+                config = Config.from_yaml(temp_config.name)
+            finally:
+                os.remove(temp_config.name)
+
+            # Every run starts with an empty cache.
+            config.online_moves.cache.enabled = cache
+            config.online_moves.cache.path = os.path.join(temp_dir, f'position_cache_{game_count}.sqlite3')
+            config.online_moves.cache.prefetch = prefetch
+            api_module.CHESSDB_URL = api_module.EXPLORER_URL = api_module.TABLEBASE_URL = url
+
+            process = psutil.Process()
+            start_cpu_times = process.cpu_times()
+            start_time = time.perf_counter()
+            max_rss = process.memory_info().rss
+            stats: dict[str, Any] = {}
+
+            bot_output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            with bot_output:
+                async with API(config) as api:
+                    game_manager = Game_Manager(api, config, USERNAME)
+                    game_manager_task = asyncio.create_task(game_manager.run())
+                    event_handler_task = asyncio.create_task(Event_Handler(api, config, USERNAME, game_manager).run())
+
+                    while True:
+                        await asyncio.sleep(0.5)
+                        max_rss = max(max_rss, process.memory_info().rss)
+                        try:
+                            async with api.lichess_session.get('/stand-in/stats') as response:
+                                stats = await response.json()
+                        except (aiohttp.ClientError, TimeoutError):
+                            # A busy machine may delay the poll, the games go on.
+                            continue
+
+                        if stats['finished'] == stats['games'] and not game_manager.tasks:
+                            break
+
+                    game_manager.stop()
+                    await game_manager_task
+                    event_handler_task.cancel()
+
+            duration = time.perf_counter() - start_time
+            end_cpu_times = process.cpu_times()
+            cpu_time = end_cpu_times.user + end_cpu_times.system - start_cpu_times.user - start_cpu_times.system
+            server.terminate()
+            await server.wait()
+
+            position_cache = game_manager.position_cache
+            cached = position_cache.hits / position_cache.lookups if position_cache.lookups else 0.0
+            latencies = stats['move_latencies']
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+            print(f'{game_count:5} {len(latencies):6} {quantiles[49] * 1000:6.1f} ms {quantiles[89] * 1000:6.1f} ms '
+                  f'{quantiles[98] * 1000:6.1f} ms {cpu_time / duration * 100:5.1f} % {max_rss / 2**20:6.1f} MB '
+                  f'{stats["failures"]:9} {cached * 100:5.1f} %')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local lichess stand-in for load and latency benchmarks.')
+    parser.add_argument('mode', choices=['serve', 'benchmark'], help='Only run the server or run the benchmark.')
+    parser.add_argument('--config', '-c', default='config.yml', type=str, help='Path to config.yml of the bot.')
+    parser.add_argument('--games', '-g', nargs='+', default=[10, 30, 100], type=int, help='Concurrent games.')
+    parser.add_argument('--port', '-p', default=8080, type=int, help='Port of the server in serve mode.')
+    parser.add_argument('--initial-time', default=60.0, type=float, help='Initial clock time in seconds.')
+    parser.add_argument('--increment', default=0.0, type=float, help='Clock increment in seconds.')
+    parser.add_argument('--opponent-move-time', default=0.2, type=float, help='Average opponent think time.')
+    parser.add_argument('--latency', default=0.02, type=float, help='Average simulated network latency.')
+    parser.add_argument('--failure-rate', default=0.0, type=float, help='Share of requests that fail with HTTP 500.')
+    parser.add_argument('--max-plies', default=60, type=int, help='Half moves after which a game is drawn.')
+    parser.add_argument('--online-time', default=0.0, type=float,
+                        help='Average response time of cloud eval, opening explorer, ChessDB and tablebase.')
+    parser.add_argument('--cloud-plies', default=0, type=int, help='Half moves for which the cloud eval has a PV.')
+    parser.add_argument('--follow-cloud', default=0.0, type=float,
+                        help='Share of opponent moves that are the reply predicted by the cloud eval.')
+    parser.add_argument('--cache', action='store_true', help='Use a position cache that starts empty.')
+    parser.add_argument('--no-prefetch', action='store_true', help='Do not prefetch into the position cache.')
+    parser.add_argument('--instant-engine', action='store_true',
+                        help='Replace the configured engines with one that answers every search at once.')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Show the output of the bot.')
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        asyncio.run(_serve(args.port, Lichess_Stand_In(args.games[0],
+                                                       args.initial_time,
+                                                       args.increment,
+                                                       args.opponent_move_time,
+                                                       args.latency,
+                                                       args.failure_rate,
+                                                       args.max_plies,
+                                                       args.online_time,
+                                                       args.cloud_plies,
+                                                       args.follow_cloud)))
+    else:
+        asyncio.run(_benchmark(args.config, args.games, ['--initial-time', str(args.initial_time),
+                                                         '--increment', str(args.increment),
+                                                         '--opponent-move-time', str(args.opponent_move_time),
+                                                         '--latency', str(args.latency),
+                                                         '--failure-rate', str(args.failure_rate),
+                                                         '--max-plies', str(args.max_plies),
+                                                         '--online-time', str(args.online_time),
+                                                         '--cloud-plies', str(args.cloud_plies),
+                                                         '--follow-cloud', str(args.follow_cloud)],
+                               args.cache, not args.no_prefetch, args.instant_engine, args.verbose))
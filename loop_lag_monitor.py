@@ -0,0 +1,49 @@
+import asyncio
+import statistics
+from collections import deque
+
+SAMPLE_INTERVAL = 0.1
+STALL_THRESHOLD = 0.05
+MAX_SAMPLES = 3000
+
+
+class Loop_Lag_Monitor:
+    def __init__(self) -> None:
+        self.lags: deque[float] = deque(maxlen=MAX_SAMPLES)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+
+    def reset(self) -> None:
+        self.lags.clear()
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    @property
+    def stats_str(self) -> str:
+        if len(self.lags) < 2:
+            return 'Loop lag: no samples yet.'
+
+        quantiles = statistics.quantiles(self.lags, n=100, method='inclusive')
+        return (f'Loop lag: {quantiles[49] * 1000:.1f} ms p50 {quantiles[98] * 1000:.1f} ms p99 '
+                f'{self.max_lag * 1000:.1f} ms max     Stalls over {STALL_THRESHOLD * 1000:.0f} ms: {self.stalls}')
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start_time = loop.time()
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            # Everything beyond the interval is time other callbacks held the loop.
+            lag = max(loop.time() - start_time - SAMPLE_INTERVAL, 0.0)
+
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > STALL_THRESHOLD:
+                self.stalls += 1
@@ -1,13 +1,15 @@
 import random
+import time
 from datetime import datetime, timedelta
 
 from api import API
 from botli_dataclasses import Bot, Challenge_Request, Challenge_Response, Matchmaking_Type
 from challenger import Challenger
 from config import Config
-from enums import Busy_Reason, Perf_Type, Variant
+from enums import Busy_Reason, Challenge_Color, Perf_Type, Variant
 from exceptions import NoOpponentException
 from opponents import Opponents
+from user_status_cache import MAX_IDS_PER_REQUEST, User_Status_Cache
 
 
 class Matchmaking:
@@ -21,6 +23,7 @@ class Matchmaking:
         self.suspended_types: list[Matchmaking_Type] = []
         self.opponents = Opponents(config.matchmaking.delay, username)
         self.challenger = Challenger(api)
+        self.user_status_cache = User_Status_Cache(api)
 
         self.game_start_time: datetime = datetime.now()
         self.online_bots: list[Bot] = []
@@ -38,8 +41,10 @@ class Matchmaking:
 
             print(f'Matchmaking type: {self.current_type}')
 
+        start_time = time.perf_counter()
+        status_requests = self.user_status_cache.requests
         try:
-            next_opponent = self.opponents.get_opponent(self.online_bots, self.current_type)
+            next_opponent = await self._get_next_opponent(self.current_type)
         except NoOpponentException:
             print(f'Suspending matchmaking type {self.current_type.name} because no suitable opponent is available.')
             self.suspended_types.append(self.current_type)
@@ -64,21 +69,12 @@ class Matchmaking:
             return
 
         opponent, color = next_opponent
-
-        match await self._get_busy_reason(opponent):
-            case Busy_Reason.PLAYING:
-                rating_diff = opponent.rating_diffs[self.current_type.perf_type]
-                print(f'Skipping {opponent.username} ({rating_diff:+}) as {color} ...')
-                self.opponents.busy_bots.append(opponent)
-                return
-
-            case Busy_Reason.OFFLINE:
-                print(f'Removing {opponent.username} from online bots ...')
-                self.online_bots.remove(opponent)
-                return
+        selection_time = time.perf_counter() - start_time
+        status_requests = self.user_status_cache.requests - status_requests
 
         rating_diff = opponent.rating_diffs[self.current_type.perf_type]
-        print(f'Challenging {opponent.username} ({rating_diff:+}) as {color} to {self.current_type.name} ...')
+        print(f'Challenging {opponent.username} ({rating_diff:+}) as {color} to {self.current_type.name} ... '
+              f'[{selection_time * 1000:.0f} ms, {status_requests} status request(s)]')
         challenge_request = Challenge_Request(opponent.username, self.current_type.initial_time,
                                               self.current_type.increment, self.current_type.rated, color,
                                               self.current_type.variant, self.timeout)
@@ -243,10 +239,24 @@ class Matchmaking:
 
         return Variant(perf_type)
 
-    async def _get_busy_reason(self, bot: Bot) -> Busy_Reason | None:
-        bot_status = await self.api.get_user_status(bot.username)
-        if 'online' not in bot_status:
-            return Busy_Reason.OFFLINE
+    async def _get_next_opponent(self, matchmaking_type: Matchmaking_Type) -> tuple[Bot, Challenge_Color] | None:
+        candidates = self.opponents.get_candidates(self.online_bots, matchmaking_type)
+
+        # One status request at a time, the search stops at the first chunk with a free opponent.
+        for i in range(0, len(candidates), MAX_IDS_PER_REQUEST):
+            chunk = candidates[i:i + MAX_IDS_PER_REQUEST]
+            busy_reasons = await self._get_busy_reasons(chunk)
+            if next_opponent := self.opponents.get_opponent(chunk, self.online_bots, matchmaking_type, busy_reasons):
+                return next_opponent
+
+        self.opponents.busy_bots.clear()
+
+    async def _get_busy_reasons(self, bots: list[Bot]) -> dict[str, Busy_Reason]:
+        busy_reasons: dict[str, Busy_Reason] = {}
+        for user_id, bot_status in (await self.user_status_cache.get_statuses([bot.username for bot in bots])).items():
+            if 'online' not in bot_status:
+                busy_reasons[user_id] = Busy_Reason.OFFLINE
+            elif 'playing' in bot_status:
+                busy_reasons[user_id] = Busy_Reason.PLAYING
 
-        if 'playing' in bot_status:
-            return Busy_Reason.PLAYING
+        return busy_reasons
@@ -0,0 +1,49 @@
+import argparse
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_loads: Callable[[bytes], Any] = orjson.loads if orjson else json.loads
+
+
+def decode_line(line: bytes) -> dict[str, Any] | None:
+    if line.isspace() or not line:
+        return
+
+    return json_loads(line)
+
+
+def _benchmark(capture_path: str, repeat: int) -> None:
+    with open(capture_path, 'rb') as capture_file:
+        lines = capture_file.readlines()
+
+    decoders: dict[str, Callable[[bytes], Any]] = {'json': json.loads}
+    if orjson:
+        decoders['orjson'] = orjson.loads
+
+    for name, loads in decoders.items():
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for line in lines:
+                if line.isspace() or not line:
+                    continue
+
+                loads(line)
+
+        duration = time.perf_counter() - start_time
+        print(f'{name:8} {len(lines) * repeat / duration:12.0f} lines/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark NDJSON decoding of a recorded Lichess stream.')
+    parser.add_argument('capture', type=str, help='Path to a recorded event or game stream.')
+    parser.add_argument('--repeat', '-r', default=100, type=int, help='How often the capture is decoded.')
+    args = parser.parse_args()
+
+    _benchmark(args.capture, args.repeat)
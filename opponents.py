@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 from typing import Any
 
 from botli_dataclasses import Bot, Matchmaking_Data, Matchmaking_Type
-from enums import Challenge_Color, Perf_Type
+from enums import Busy_Reason, Challenge_Color, Perf_Type
 from exceptions import NoOpponentException
 
 
@@ -17,19 +17,40 @@ class Opponents:
         self.busy_bots: list[Bot] = []
         self.last_opponent: tuple[str, Challenge_Color, Matchmaking_Type]
 
-    def get_opponent(self,
-                     online_bots: list[Bot],
-                     matchmaking_type: Matchmaking_Type) -> tuple[Bot, Challenge_Color] | None:
+    def get_candidates(self, online_bots: list[Bot], matchmaking_type: Matchmaking_Type) -> list[Bot]:
+        candidates: list[Bot] = []
         for bot in self._filter_bots(online_bots, matchmaking_type):
             if bot in self.busy_bots:
                 continue
 
             data = self.opponent_dict[bot.username][matchmaking_type.perf_type]
             if data.color == Challenge_Color.BLACK or data.release_time <= datetime.now():
-                self.last_opponent = (bot.username, data.color, matchmaking_type)
-                return bot, data.color
+                candidates.append(bot)
 
-        self.busy_bots.clear()
+        return candidates
+
+    def get_opponent(self,
+                     candidates: list[Bot],
+                     online_bots: list[Bot],
+                     matchmaking_type: Matchmaking_Type,
+                     busy_reasons: dict[str, Busy_Reason]) -> tuple[Bot, Challenge_Color] | None:
+        for bot in candidates:
+            data = self.opponent_dict[bot.username][matchmaking_type.perf_type]
+
+            match busy_reasons.get(bot.username.lower()):
+                case Busy_Reason.PLAYING:
+                    rating_diff = bot.rating_diffs[matchmaking_type.perf_type]
+                    print(f'Skipping {bot.username} ({rating_diff:+}) as {data.color} ...')
+                    self.busy_bots.append(bot)
+                    continue
+
+                case Busy_Reason.OFFLINE:
+                    print(f'Removing {bot.username} from online bots ...')
+                    online_bots.remove(bot)
+                    continue
+
+            self.last_opponent = (bot.username, data.color, matchmaking_type)
+            return bot, data.color
 
     def add_timeout(self, success: bool, game_duration: timedelta) -> None:
         username, color, matchmaking_type = self.last_opponent
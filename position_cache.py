@@ -0,0 +1,193 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import chess
+
+from botli_dataclasses import Cached_Response
+from configs import Online_Cache_Config
+
+TTLS = {'opening_explorer': 6 * 60 * 60,
+        'lichess_cloud': 7 * 24 * 60 * 60,
+        'chessdb': 24 * 60 * 60,
+        'online_egtb': 30 * 24 * 60 * 60}
+MISS_TTL = 60 * 60
+MAX_MEMORY_ENTRIES = 10_000
+FLUSH_INTERVAL = 5.0
+
+
+class Position_Cache:
+    def __init__(self, config: Online_Cache_Config) -> None:
+        self.enabled = config.enabled
+        self.prefetch = config.enabled and config.prefetch
+        self.prefetching: set[str] = set()
+        self.memory: OrderedDict[str, tuple[str, float, float]] = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.connection: sqlite3.Connection | None = None
+        # Rows are committed in batches by a single writer thread, lookups stay on the reading connection.
+        self.writer: sqlite3.Connection | None = None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='position_cache')
+        self.pending_rows: dict[str, tuple[str, float, float]] = {}
+        self.flush_task: asyncio.Task[None] | None = None
+
+        if self.enabled:
+            self.connection = self._open_database(config.path)
+
+        if self.connection is not None:
+            self.writer = self._open_writer(config.path)
+
+    def get(self, source: str, board: chess.Board, params: dict[str, Any]) -> Cached_Response | None:
+        if not self.enabled:
+            return
+
+        self.lookups += 1
+        if cached_entry := self._lookup(self._get_key(source, board, params)):
+            self.hits += 1
+            return Cached_Response(json.loads(cached_entry[0]), cached_entry[1])
+
+    def peek(self, source: str, board: chess.Board, params: dict[str, Any]) -> dict[str, Any] | None:
+        if not self.enabled:
+            return
+
+        if cached_entry := self._lookup(self._get_key(source, board, params)):
+            return json.loads(cached_entry[0])
+
+    def _lookup(self, key: str) -> tuple[str, float] | None:
+        now = time.time()
+
+        if key in self.memory:
+            response_text, fetch_time, expires = self.memory[key]
+            if expires > now:
+                self.memory.move_to_end(key)
+                return response_text, fetch_time
+
+            del self.memory[key]
+
+        if self.connection is None:
+            return
+
+        try:
+            row = self.connection.execute('SELECT response, fetch_time, expires FROM positions WHERE key = ?',
+                                          (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f'Position cache: {e}')
+            return
+
+        if row is None or row[2] <= now:
+            return
+
+        self._remember(key, row[0], row[1], row[2])
+        return row[0], row[1]
+
+    def put(self,
+            source: str,
+            board: chess.Board,
+            params: dict[str, Any],
+            response: dict[str, Any],
+            fetch_time: float) -> None:
+        if not self.enabled:
+            return
+
+        key = self._get_key(source, board, params)
+        ttl = MISS_TTL if self._is_miss(source, response) else TTLS[source]
+        expires = time.time() + ttl
+        response_text = json.dumps(response)
+        self._remember(key, response_text, fetch_time, expires)
+
+        if self.writer is None:
+            return
+
+        self.pending_rows[key] = (response_text, fetch_time, expires)
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush())
+
+    async def close(self) -> None:
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+
+        if self.writer is not None:
+            await self._write_pending_rows()
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.writer.close)
+            self.writer = None
+
+        self.executor.shutdown()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    async def _flush(self) -> None:
+        while self.pending_rows:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self._write_pending_rows()
+
+        self.flush_task = None
+
+    async def _write_pending_rows(self) -> None:
+        rows = self.pending_rows
+        self.pending_rows = {}
+        if rows:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._write_rows, rows)
+
+    def _write_rows(self, rows: dict[str, tuple[str, float, float]]) -> None:
+        assert self.writer
+        try:
+            with self.writer:
+                self.writer.executemany('INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?)',
+                                        [(key, *row) for key, row in rows.items()])
+        except sqlite3.Error as e:
+            print(f'Position cache: {e}')
+
+    def _remember(self, key: str, response_text: str, fetch_time: float, expires: float) -> None:
+        self.memory[key] = (response_text, fetch_time, expires)
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > MAX_MEMORY_ENTRIES:
+            self.memory.popitem(last=False)
+
+    @staticmethod
+    def _open_database(path: str) -> sqlite3.Connection | None:
+        try:
+            connection = sqlite3.connect(path)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS positions '
+                                   '(key TEXT PRIMARY KEY, response TEXT, fetch_time REAL, expires REAL)')
+                connection.execute('DELETE FROM positions WHERE expires <= ?', (time.time(),))
+            return connection
+        except sqlite3.Error as e:
+            print(f'Position cache "{path}" could not be opened, using memory only: {e}')
+
+    @staticmethod
+    def _open_writer(path: str) -> sqlite3.Connection | None:
+        try:
+            # Only the writer thread uses this connection.
+            writer = sqlite3.connect(path, check_same_thread=False)
+            writer.execute('PRAGMA synchronous=NORMAL')
+            return writer
+        except sqlite3.Error as e:
+            print(f'Position cache "{path}" could not be opened for writing, using memory only: {e}')
+
+    @staticmethod
+    def _get_key(source: str, board: chess.Board, params: dict[str, Any]) -> str:
+        return f'{source} {board.uci_variant} {board.epd()} {json.dumps(params, sort_keys=True)}'
+
+    @staticmethod
+    def _is_miss(source: str, response: dict[str, Any]) -> bool:
+        match source:
+            case 'opening_explorer':
+                return not response.get('moves')
+            case 'lichess_cloud':
+                return 'error' in response
+            case 'chessdb':
+                return response.get('status') != 'ok'
+            case 'online_egtb':
+                return response.get('category') == 'unknown'
+
+        return False
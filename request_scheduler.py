@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from itertools import count
+
+from enums import Request_Class
+
+# requests per second, burst
+BUDGETS = {Request_Class.MOVE: (20.0, 40.0),
+           Request_Class.GAME: (5.0, 10.0),
+           Request_Class.CHALLENGE: (2.0, 10.0),
+           Request_Class.STATUS: (1.0, 5.0),
+           Request_Class.OTHER: (1.0, 5.0),
+           Request_Class.CLOUD_EVAL: (1.0, 5.0),
+           Request_Class.CHAT: (1.0, 5.0)}
+PRIORITIES = {request_class: priority for priority, request_class in enumerate(BUDGETS)}
+# Moves and game streams or actions are never held back, a delayed one costs clock time or the game.
+BACKOFF_EXEMPT_CLASSES = {Request_Class.MOVE, Request_Class.GAME}
+MAX_ACTIVE_REQUESTS = 8
+RATE_LIMIT_BACKOFF = 60.0
+# Tokens an optional request, like a prefetch, leaves for the requests that cannot be postponed.
+SPARE_BUDGET_RESERVE = 1.0
+
+
+class Token_Bucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.update_time = time.monotonic()
+
+    def take(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.update_time) * self.rate, self.burst)
+        self.update_time = now
+
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+
+        return (1.0 - self.tokens) / self.rate
+
+    @property
+    def available(self) -> float:
+        return min(self.tokens + (time.monotonic() - self.update_time) * self.rate, self.burst)
+
+
+class Request_Stats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.rate_limits = 0
+
+    def add(self, wait: float) -> None:
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class Request_Scheduler:
+    def __init__(self) -> None:
+        self.buckets = {request_class: Token_Bucket(*budget) for request_class, budget in BUDGETS.items()}
+        self.stats = {request_class: Request_Stats() for request_class in BUDGETS}
+        self.active_requests = 0
+        self.waiting: list[tuple[int, int, asyncio.Future[None]]] = []
+        self.waiting_counter = count()
+        self.backoff_until = {request_class: 0.0 for request_class in BUDGETS}
+
+    @asynccontextmanager
+    async def schedule(self, request_class: Request_Class, max_wait: float | None = None) -> AsyncIterator[None]:
+        start_time = time.monotonic()
+        await self.throttle(request_class, record=False, max_wait=max_wait)
+        async with asyncio.timeout(max_wait - (time.monotonic() - start_time) if max_wait is not None else None):
+            await self._acquire(request_class)
+        self.stats[request_class].add(time.monotonic() - start_time)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def throttle(self,
+                       request_class: Request_Class,
+                       record: bool = True,
+                       max_wait: float | None = None) -> None:
+        start_time = time.monotonic()
+        deadline = start_time + max_wait if max_wait is not None else None
+
+        # Waits that would outlast the deadline fail at once, so the caller can fall back right away.
+        while (backoff := self.backoff_until[request_class] - time.monotonic()) > 0.0:
+            if deadline is not None and time.monotonic() + backoff > deadline:
+                raise TimeoutError(f'{request_class} requests are backing off after a rate limit.')
+            await asyncio.sleep(backoff)
+
+        while (delay := self.buckets[request_class].take()) > 0.0:
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError(f'{request_class} request budget is spent.')
+            await asyncio.sleep(delay)
+
+        if record:
+            self.stats[request_class].add(time.monotonic() - start_time)
+
+    def has_spare_budget(self, request_class: Request_Class) -> bool:
+        return (time.monotonic() >= self.backoff_until[request_class]
+                and self.buckets[request_class].available >= 1.0 + SPARE_BUDGET_RESERVE)
+
+    def back_off(self, request_class: Request_Class) -> None:
+        self.stats[request_class].rate_limits += 1
+        if request_class in BACKOFF_EXEMPT_CLASSES:
+            print(f'Rate limited by lichess on {request_class} requests.')
+            return
+
+        self.backoff_until[request_class] = max(self.backoff_until[request_class],
+                                                time.monotonic() + RATE_LIMIT_BACKOFF)
+        print(f'Rate limited by lichess, pausing {request_class} requests for {RATE_LIMIT_BACKOFF:.0f} seconds ...')
+
+    @property
+    def stats_str(self) -> str:
+        lines = [f'Active: {self.active_requests}     Queued: {len(self.waiting)}']
+        for request_class, stats in self.stats.items():
+            average_wait = stats.total_wait / stats.requests if stats.requests else 0.0
+            lines.append(f'{request_class:10} {stats.requests:6} requests     '
+                         f'Wait: {average_wait * 1000:.1f} ms avg {stats.max_wait * 1000:.1f} ms max     '
+                         f'Rate limits: {stats.rate_limits}')
+
+        return '\n'.join(lines)
+
+    async def _acquire(self, request_class: Request_Class) -> None:
+        if request_class == Request_Class.MOVE or (self.active_requests < MAX_ACTIVE_REQUESTS and not self.waiting):
+            self.active_requests += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (PRIORITIES[request_class], next(self.waiting_counter), future)
+        heapq.heappush(self.waiting, entry)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                self._release()
+            elif entry in self.waiting:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+            raise
+
+    def _release(self) -> None:
+        self.active_requests -= 1
+
+        while self.waiting and self.active_requests < MAX_ACTIVE_REQUESTS:
+            _, _, future = heapq.heappop(self.waiting)
+            if future.done():
+                continue
+
+            self.active_requests += 1
+            future.set_result(None)
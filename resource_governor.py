@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from itertools import count
+
+import psutil
+
+SPEED_WEIGHTS = {'ultraBullet': 1.0, 'bullet': 1.0, 'blitz': 2.0, 'rapid': 3.0, 'classical': 4.0}
+CRITICAL_MOVE_TIME = 1.0
+RESIZE_TOLERANCE = 1.5
+
+
+class Resource_Governor:
+    def __init__(self) -> None:
+        self.cores = psutil.cpu_count(logical=True) or 1
+        self.memory_mb = psutil.virtual_memory().total // 2**20 // 2
+        self.weights: dict[str, float] = {}
+        self.limits: dict[str, tuple[int | None, int | None]] = {}
+        self.running_threads = 0
+        self.pondering: dict[str, tuple[int, Callable[[], None]]] = {}
+        self.waiting: list[tuple[float, int, int, asyncio.Future[None]]] = []
+        self.waiting_counter = count()
+
+    def register(self, game_id: str, speed: str) -> None:
+        self.weights[game_id] = SPEED_WEIGHTS.get(speed, 4.0)
+
+    def unregister(self, game_id: str) -> None:
+        self.weights.pop(game_id, None)
+        self.limits.pop(game_id, None)
+        self.set_pondering(game_id, 0)
+
+    def set_pondering(self, game_id: str, threads: int, stop_pondering: Callable[[], None] | None = None) -> None:
+        # A pondering engine keeps its cores busy until its next search or until a search needs them.
+        pondering_threads, _ = self.pondering.pop(game_id, (0, None))
+        self._release(pondering_threads)
+        if threads and stop_pondering:
+            self.pondering[game_id] = (threads, stop_pondering)
+            self.running_threads += threads
+
+    def get_limits(self, game_id: str, max_threads: int | None, max_hash: int | None) -> tuple[int | None, int | None]:
+        share = self.weights.get(game_id, 1.0) / max(sum(self.weights.values()), 1.0)
+
+        threads = None if max_threads is None else max(min(int(self.cores * share), max_threads), 1)
+        hash_size = None if max_hash is None else max(min(self._round_hash(self.memory_mb * share), max_hash), 1)
+
+        if game_id in self.limits:
+            # Setting Threads or Hash clears the hash table of most engines and stops pondering.
+            # During a game the limits therefore only change once they are clearly too large or too small.
+            current_threads, current_hash = self.limits[game_id]
+            if max_threads is not None:
+                threads = self._keep_or_resize(current_threads, threads, min(self.cores * share, max_threads))
+            if max_hash is not None:
+                hash_size = self._keep_or_resize(current_hash, hash_size, min(self.memory_mb * share, max_hash))
+
+        self.limits[game_id] = (threads, hash_size)
+        return threads, hash_size
+
+    @asynccontextmanager
+    async def reserve(self, game_id: str, threads: int, own_time: float, increment: float) -> AsyncIterator[None]:
+        self.set_pondering(game_id, 0)
+        await self._acquire(threads, own_time / 30 + increment)
+        try:
+            yield
+        finally:
+            self._release(threads)
+
+    async def _acquire(self, threads: int, move_time: float) -> None:
+        self._stop_pondering(self.running_threads + threads - self.cores)
+        if move_time <= CRITICAL_MOVE_TIME or self.running_threads + threads <= self.cores:
+            self.running_threads += threads
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (move_time, next(self.waiting_counter), threads, future)
+        heapq.heappush(self.waiting, entry)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), move_time / 2)
+        except TimeoutError:
+            if not future.done():
+                self._remove_waiting(entry)
+                self.running_threads += threads
+        except asyncio.CancelledError:
+            if future.done():
+                self._release(threads)
+            else:
+                self._remove_waiting(entry)
+            raise
+
+    def _release(self, threads: int) -> None:
+        self.running_threads -= threads
+
+        while self.waiting and self.running_threads + self.waiting[0][2] <= self.cores:
+            _, _, waiting_threads, future = heapq.heappop(self.waiting)
+            self.running_threads += waiting_threads
+            future.set_result(None)
+
+    def _stop_pondering(self, threads: int) -> None:
+        # Searches come first, pondering engines are stopped until the search fits.
+        for game_id, (pondering_threads, stop_pondering) in list(self.pondering.items()):
+            if threads <= 0:
+                return
+
+            stop_pondering()
+            self.set_pondering(game_id, 0)
+            threads -= pondering_threads
+
+    def _remove_waiting(self, entry: tuple[float, int, int, asyncio.Future[None]]) -> None:
+        self.waiting.remove(entry)
+        heapq.heapify(self.waiting)
+
+    @staticmethod
+    def _keep_or_resize(current: int | None, target: int | None, fair_share: float) -> int | None:
+        if current is None or not fair_share / RESIZE_TOLERANCE <= current <= fair_share * RESIZE_TOLERANCE:
+            return target
+
+        return current
+
+    @staticmethod
+    def _round_hash(hash_size: float) -> int:
+        rounded_hash = 1
+        while rounded_hash * 2 <= hash_size:
+            rounded_hash *= 2
+
+        return rounded_hash
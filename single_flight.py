@@ -0,0 +1,68 @@
+import asyncio
+import copy
+import functools
+import json
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import chess
+
+RESPONSE_TTL = 5.0
+
+
+class Single_Flight:
+    def __init__(self) -> None:
+        self.in_flight: dict[str, asyncio.Future[dict[str, Any] | None]] = {}
+        self.responses: dict[str, tuple[dict[str, Any], float]] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.hits = 0
+
+    async def run(self,
+                  source: str,
+                  board: chess.Board,
+                  params: dict[str, Any],
+                  request: Callable[[], Awaitable[dict[str, Any] | None]]
+                  ) -> dict[str, Any] | None:
+        key = self._get_key(source, board, params)
+        now = time.monotonic()
+        if key in self.responses:
+            response, fetch_time = self.responses[key]
+            if now - fetch_time < RESPONSE_TTL:
+                self.hits += 1
+                return copy.deepcopy(response)
+
+            del self.responses[key]
+
+        if key in self.in_flight:
+            self.coalesced += 1
+        else:
+            self.requests += 1
+            self.in_flight[key] = asyncio.ensure_future(request())
+            self.in_flight[key].add_done_callback(functools.partial(self._on_done, key))
+
+        # A cancelled caller, e.g. a lost race, must not cancel the request other games are waiting for.
+        response = await asyncio.shield(self.in_flight[key])
+        return copy.deepcopy(response)
+
+    def _on_done(self, key: str, future: asyncio.Future[dict[str, Any] | None]) -> None:
+        del self.in_flight[key]
+        if future.cancelled() or future.exception() is not None or (response := future.result()) is None:
+            return
+
+        self.responses[key] = (response, time.monotonic())
+
+        now = time.monotonic()
+        for expired_key in [response_key for response_key, (_, fetch_time) in self.responses.items()
+                            if now - fetch_time >= RESPONSE_TTL]:
+            del self.responses[expired_key]
+
+    @property
+    def stats_str(self) -> str:
+        return (f'Online requests: {self.requests}     Coalesced: {self.coalesced}     '
+                f'Cached: {self.hits}     In flight: {len(self.in_flight)}')
+
+    @staticmethod
+    def _get_key(source: str, board: chess.Board, params: dict[str, Any]) -> str:
+        return f'{source} {board.uci_variant} {board.epd()} {json.dumps(params, sort_keys=True)}'
@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+import chess
+import chess.gaviota
+import chess.syzygy
+
+from loop_lag_monitor import Loop_Lag_Monitor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Enough to keep all 290 files of the 5-piece set open in the handle the games share.
+MAX_SYZYGY_FDS = 512
+# Share of the open file limit for table files, the rest is left for connections, engines and books.
+SYZYGY_FD_SHARE = 4
+MAX_PROBE_WORKERS = 4
+SAMPLE_PAUSE = 0.05
+
+T = TypeVar('T')
+
+Gaviota_Tablebase = chess.gaviota.PythonTablebase | chess.gaviota.NativeTablebase
+
+
+class Tablebase_Registry:
+    def __init__(self) -> None:
+        self.tablebases: dict[tuple[Any, ...], chess.syzygy.Tablebase | Gaviota_Tablebase] = {}
+        self.ref_counts: dict[tuple[Any, ...], int] = {}
+        self.executor = ThreadPoolExecutor(MAX_PROBE_WORKERS, thread_name_prefix='tablebase')
+        self.gaviota_lock = threading.Lock()
+        self.max_syzygy_fds = self._get_max_syzygy_fds()
+        self.probes = 0
+        self.probe_time = 0.0
+
+    async def run(self, func: Callable[..., T], *func_args: Any) -> T:
+        start_time = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *func_args)
+        finally:
+            self.probes += 1
+            self.probe_time += time.perf_counter() - start_time
+
+    @property
+    def stats_str(self) -> str:
+        average_probe_time = self.probe_time / self.probes if self.probes else 0.0
+        open_tables = sum(len(tablebase.lru) for tablebase in self.tablebases.values()
+                          if isinstance(tablebase, chess.syzygy.Tablebase))
+        return (f'Tablebase probes: {self.probes} off the loop     '
+                f'Probe: {average_probe_time * 1000:.1f} ms avg {self.probe_time:.1f} s total     '
+                f'Syzygy files: {open_tables} open ({self.max_syzygy_fds} max per handle)')
+
+    async def run_gaviota(self, func: Callable[..., T], *func_args: Any) -> T:
+        def locked_func() -> T:
+            with self.gaviota_lock:
+                return func(*func_args)
+
+        return await self.run(locked_func)
+
+    def acquire_syzygy(self, paths: list[str], VariantBoard: type[chess.Board]) -> chess.syzygy.Tablebase:
+        key = ('syzygy', VariantBoard, tuple(paths))
+        if key not in self.tablebases:
+            tablebase = chess.syzygy.open_tablebase(paths[0], max_fds=self.max_syzygy_fds, VariantBoard=VariantBoard)
+
+            for path in paths[1:]:
+                tablebase.add_directory(path)
+
+            self.tablebases[key] = tablebase
+
+        self.ref_counts[key] = self.ref_counts.get(key, 0) + 1
+        tablebase = self.tablebases[key]
+        assert isinstance(tablebase, chess.syzygy.Tablebase)
+        return tablebase
+
+    def acquire_gaviota(self, paths: list[str]) -> Gaviota_Tablebase:
+        key = ('gaviota', tuple(paths))
+        if key not in self.tablebases:
+            tablebase = chess.gaviota.open_tablebase(paths[0])
+
+            for path in paths[1:]:
+                tablebase.add_directory(path)
+
+            self.tablebases[key] = tablebase
+
+        self.ref_counts[key] = self.ref_counts.get(key, 0) + 1
+        tablebase = self.tablebases[key]
+        assert not isinstance(tablebase, chess.syzygy.Tablebase)
+        return tablebase
+
+    def release(self, tablebase: chess.syzygy.Tablebase | Gaviota_Tablebase) -> None:
+        for key, registered_tablebase in self.tablebases.items():
+            if registered_tablebase is not tablebase:
+                continue
+
+            self.ref_counts[key] -= 1
+            if self.ref_counts[key] == 0:
+                del self.tablebases[key]
+                del self.ref_counts[key]
+                tablebase.close()
+
+            return
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _get_max_syzygy_fds() -> int:
+        if resource is None:
+            return MAX_SYZYGY_FDS
+
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft_limit == resource.RLIM_INFINITY:
+            return MAX_SYZYGY_FDS
+
+        return max(min(MAX_SYZYGY_FDS, soft_limit // SYZYGY_FD_SHARE), 1)
+
+
+def _random_endgame(pieces: int) -> chess.Board:
+    while True:
+        board = chess.Board(None)
+        squares = random.sample(chess.SQUARES, pieces)
+        board.set_piece_at(squares[0], chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(squares[1], chess.Piece(chess.KING, chess.BLACK))
+        for square in squares[2:]:
+            piece_type = random.choice([chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN])
+            board.set_piece_at(square, chess.Piece(piece_type, random.choice(chess.COLORS)))
+
+        if board.is_valid() and not board.is_game_over():
+            return board
+
+
+def _get_child_boards(board: chess.Board) -> list[chess.Board]:
+    child_boards: list[chess.Board] = []
+    for move in board.legal_moves:
+        child_board = board.copy(stack=False)
+        child_board.push(move)
+        child_boards.append(child_board)
+
+    return child_boards
+
+
+def _get_open_fds() -> int:
+    return len(os.listdir('/proc/self/fd'))
+
+
+def _get_rss() -> int:
+    with open('/proc/self/status', encoding='utf-8') as status_file:
+        for line in status_file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+
+    return 0
+
+
+async def _benchmark(syzygy_path: str | None, positions: int, pieces: int, probe_time: float, games: int) -> None:
+    tablebase = chess.syzygy.open_tablebase(syzygy_path) if syzygy_path else None
+
+    def probe(board: chess.Board) -> int:
+        if tablebase:
+            return tablebase.probe_dtz(board)
+
+        # Without tablebases a blocking sleep stands in for a cold-cache probe.
+        time.sleep(probe_time)
+        return 0
+
+    random.seed(1)
+    boards = [_random_endgame(pieces) for _ in range(positions)]
+    registry = Tablebase_Registry()
+    monitor = Loop_Lag_Monitor()
+    monitor.start()
+
+    for mode in ('inline', 'executor'):
+        await asyncio.sleep(0.2)
+        monitor.reset()
+        start_time = time.perf_counter()
+        for board in boards:
+            child_boards = _get_child_boards(board)
+
+            if mode == 'inline':
+                for child_board in child_boards:
+                    probe(child_board)
+            else:
+                await asyncio.gather(*(registry.run(probe, child_board) for child_board in child_boards))
+
+            # Other games get the loop between two root probes.
+            await asyncio.sleep(SAMPLE_PAUSE)
+
+        print(f'{mode:8} {positions} roots in {time.perf_counter() - start_time:5.2f} s     {monitor.stats_str}')
+
+    monitor.stop()
+    print(registry.stats_str)
+
+    if tablebase is None:
+        registry.close()
+        return
+
+    tablebase.close()
+    assert syzygy_path
+    # Every game opened its own handle with the python-chess default of 128 files before the handles were shared.
+    for mode in ('per game', 'shared'):
+        open_fds = _get_open_fds()
+        rss = _get_rss()
+        if mode == 'per game':
+            tablebases = [chess.syzygy.open_tablebase(syzygy_path) for _ in range(games)]
+        else:
+            tablebases = [registry.acquire_syzygy([syzygy_path], chess.Board) for _ in range(games)]
+
+        for game_tablebase in tablebases:
+            for board in boards:
+                for child_board in _get_child_boards(board):
+                    try:
+                        game_tablebase.probe_dtz(child_board)
+                    except KeyError:
+                        pass
+
+        print(f'{mode:8} {games} games     Open files: +{_get_open_fds() - open_fds}     '
+              f'RSS: +{(_get_rss() - rss) / 1024 / 1024:.0f} MiB')
+
+        for game_tablebase in tablebases:
+            if mode == 'per game':
+                game_tablebase.close()
+            else:
+                registry.release(game_tablebase)
+
+    registry.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure event loop lag while probing tablebase root positions.')
+    parser.add_argument('--syzygy', type=str, help='Directory of syzygy tablebases, a simulated probe otherwise.')
+    parser.add_argument('--positions', '-n', default=50, type=int, help='Root positions to probe.')
+    parser.add_argument('--pieces', default=5, type=int, help='Pieces of the random root positions.')
+    parser.add_argument('--probe-time', default=0.002, type=float, help='Seconds a simulated probe blocks.')
+    parser.add_argument('--games', default=10, type=int,
+                        help='Games probing the syzygy tablebases with their own or a shared handle.')
+    args = parser.parse_args()
+
+    asyncio.run(_benchmark(args.syzygy, args.positions, args.pieces, args.probe_time, args.games))
@@ -9,6 +9,7 @@ from typing import TypeVar
 
 from api import API
 from botli_dataclasses import Challenge_Request
+from circuit_breaker import Circuit_Breaker
 from config import Config
 from engine import Engine
 from enums import Challenge_Color, Perf_Type, Variant
@@ -28,12 +29,15 @@ COMMANDS = {
     'create': 'Challenges a player to COUNT game pairs. Usage: create COUNT USERNAME [TIMECONTROL] [RATED] [VARIANT]',
     'help': 'Prints this message.',
     'join': 'Joins a team. Usage: join TEAM [PASSWORD]',
+    'lag': 'Prints event loop lag and tablebase probe times.',
     'leave': 'Leaves tournament. Usage: leave ID',
     'matchmaking': 'Starts matchmaking mode.',
     'quit': 'Exits the bot.',
     'rechallenge': 'Challenges the opponent to the last received challenge.',
+    'requests': 'Prints queue waits, rate limits, connection reuse, circuit breakers and the chat queue.',
     'reset': 'Resets matchmaking. Usage: reset PERF_TYPE',
     'stop': 'Stops matchmaking mode.',
+    'streams': 'Prints message rate, lag, reconnects and stalls of the running game streams.',
     'tournament': 'Joins tournament. Usage: tournament ID [TEAM] [PASSWORD]',
     'whitelist': 'Temporarily whitelists a user. Use config for permanent whitelisting. Usage: whitelist USERNAME'
 }
@@ -99,6 +103,9 @@ class User_Interface:
                         self._create(command)
                     case 'join':
                         await self._join(command)
+                    case 'lag':
+                        print(self.game_manager.loop_lag_monitor.stats_str)
+                        print(self.game_manager.tablebase_registry.stats_str)
                     case 'leave':
                         self._leave(command)
                     case 'matchmaking':
@@ -108,10 +115,20 @@ class User_Interface:
                         break
                     case 'rechallenge':
                         self._rechallenge()
+                    case 'requests':
+                        print(self.api.request_scheduler.stats_str)
+                        print(f'Lichess:  {self.api.lichess_stats.stats_str}')
+                        print(f'External: {self.api.external_stats.stats_str}')
+                        for breaker in Circuit_Breaker.breakers.values():
+                            print(breaker.stats_str)
+                        print(self.game_manager.single_flight.stats_str)
+                        print(self.game_manager.chat_outbox.stats_str)
                     case 'reset':
                         self._reset(command)
                     case 'stop':
                         self._stop()
+                    case 'streams':
+                        self._streams()
                     case 'tournament':
                         self._tournament(command)
                     case 'whitelist':
@@ -292,6 +309,14 @@ class User_Interface:
         else:
             print('Matchmaking isn\'t currently running ...')
 
+    def _streams(self) -> None:
+        if not self.game_manager.game_stream_manager.streams:
+            print('No game streams running.')
+            return
+
+        for game_stream in self.game_manager.game_stream_manager.streams.values():
+            print(game_stream.stats_str)
+
     def _tournament(self, command: list[str]) -> None:
         if len(command) < 2 or len(command) > 4:
             print(COMMANDS['tournament'])
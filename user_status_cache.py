@@ -0,0 +1,45 @@
+import asyncio
+import time
+from typing import Any
+
+from api import API
+
+MAX_IDS_PER_REQUEST = 100
+STATUS_TTL = 15.0
+
+
+class User_Status_Cache:
+    def __init__(self, api: API) -> None:
+        self.api = api
+        self.statuses: dict[str, tuple[dict[str, Any], float]] = {}
+        self.requests = 0
+        self.lookups = 0
+        self.hits = 0
+
+    async def get_statuses(self, usernames: list[str]) -> dict[str, dict[str, Any]]:
+        now = time.monotonic()
+        user_ids = list(dict.fromkeys(username.lower() for username in usernames))
+        self.lookups += len(user_ids)
+
+        missing_ids = [user_id for user_id in user_ids
+                       if user_id not in self.statuses or now - self.statuses[user_id][1] >= STATUS_TTL]
+        self.hits += len(user_ids) - len(missing_ids)
+
+        chunks = [missing_ids[i:i + MAX_IDS_PER_REQUEST] for i in range(0, len(missing_ids), MAX_IDS_PER_REQUEST)]
+        self.requests += len(chunks)
+        for chunk, statuses in zip(chunks, await asyncio.gather(*(self.api.get_users_status(chunk)
+                                                                  for chunk in chunks))):
+            # Lichess leaves out unknown and closed accounts, they are cached as offline.
+            for user_id in chunk:
+                self.statuses[user_id] = ({'id': user_id}, now)
+
+            for status in statuses:
+                self.statuses[status['id']] = (status, now)
+
+        self._remove_expired(now)
+        return {user_id: self.statuses[user_id][0] for user_id in user_ids if user_id in self.statuses}
+
+    def _remove_expired(self, now: float) -> None:
+        for user_id, (_, fetch_time) in list(self.statuses.items()):
+            if now - fetch_time >= STATUS_TTL:
+                del self.statuses[user_id]